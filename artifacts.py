@@ -0,0 +1,300 @@
+"""
+Content-addressed storage for test outputs and screenshots
+
+Artifacts are keyed by the sha256 of their original bytes, so identical
+outputs and unchanged screenshots are stored once. New objects are written
+raw and compressed in the background: logs with zstd (gzip when the
+zstandard package is not installed) and images re-encoded as optimized PNG
+when Pillow is available. Each object carries a reference count; gc()
+removes objects nobody references any more, plus anything not used within
+the retention window (references held by sessions that have since ended).
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+REF_PREFIX = "sha256:"
+
+class ArtifactStore:
+    def __init__(self, root: str = "artifacts", retention_days: float = 30):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_file = self.root / "index.json"
+        self.retention = retention_days * 86400
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._index = self._load_index()
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-compress")
+        self._pending = []
+        self._batch_depth = 0
+        self._dirty = False
+
+    # Index persistence
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_file) as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save_index(self):
+        """Persist the index, or defer it to the end of the enclosing batch()"""
+        with self._lock:
+            if self._batch_depth:
+                self._dirty = True
+                return
+            self._write_index()
+
+    def _write_index(self):
+        fd, tmp_path = tempfile.mkstemp(prefix=".index.", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @contextmanager
+    def batch(self):
+        """Group several operations so the index is written once at the end"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self._dirty = False
+                    self._write_index()
+
+    def _object_path(self, digest: str, encoding: str) -> Path:
+        suffix = "" if encoding == "raw" else f".{encoding}"
+        return self.objects_dir / digest[:2] / f"{digest}{suffix}"
+
+    # Writing
+
+    def put_bytes(self, data: bytes, kind: str = "blob") -> str:
+        """
+        Store bytes and take a reference to them
+
+        Args:
+            data: Content to store
+            kind: "log", "image" or "blob"; selects the background compression
+
+        Returns:
+            str: Reference of the form "sha256:<hex>"
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._index.get(digest)
+            if entry is not None:
+                entry['refs'] += 1
+                entry['last_used'] = time.time()
+                self._save_index()
+                return REF_PREFIX + digest
+
+            path = self._object_path(digest, "raw")
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(data)
+            self._index[digest] = {
+                'kind': kind,
+                'size': len(data),
+                'stored_size': len(data),
+                'encoding': 'raw',
+                'refs': 1,
+                'created': time.time(),
+                'last_used': time.time()
+            }
+            self._save_index()
+
+        if kind in ("log", "image"):
+            self._pending.append(self._compressor.submit(self._compress, digest))
+        return REF_PREFIX + digest
+
+    def put_text(self, text: str) -> str:
+        """Store a log or output string"""
+        return self.put_bytes(text.encode('utf-8'), kind="log")
+
+    def put_file(self, path, kind: Optional[str] = None) -> str:
+        """Store the current content of a file"""
+        path = Path(path)
+        if kind is None:
+            kind = "image" if path.suffix.lower() in (".png", ".jpg", ".jpeg", ".webp") else "blob"
+        return self.put_bytes(path.read_bytes(), kind=kind)
+
+    def put_recent_files(self, directory, pattern: str, since: float) -> list[str]:
+        """Store files under directory matching pattern that were modified at or after since"""
+        refs = []
+        for path in sorted(Path(directory).glob(pattern)):
+            try:
+                if path.is_file() and path.stat().st_mtime >= since:
+                    refs.append(self.put_file(path))
+            except OSError:
+                continue
+        return refs
+
+    def _compress(self, digest: str):
+        with self._lock:
+            entry = self._index.get(digest)
+            if entry is None or entry['encoding'] != 'raw':
+                return
+            kind = entry['kind']
+        raw_path = self._object_path(digest, "raw")
+        data = raw_path.read_bytes()
+
+        if kind == "log":
+            if zstandard is not None:
+                encoding, packed = "zst", zstandard.ZstdCompressor(level=10).compress(data)
+            else:
+                encoding, packed = "gz", gzip.compress(data, compresslevel=9)
+        elif kind == "image" and Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    buffer = io.BytesIO()
+                    image.save(buffer, format="PNG", optimize=True)
+                encoding, packed = "png", buffer.getvalue()
+            except OSError:
+                return
+        else:
+            return
+
+        if len(packed) >= len(data):
+            return
+
+        packed_path = self._object_path(digest, encoding)
+        packed_path.write_bytes(packed)
+        with self._lock:
+            entry = self._index.get(digest)
+            if entry is None:
+                packed_path.unlink(missing_ok=True)
+                return
+            entry['encoding'] = encoding
+            entry['stored_size'] = len(packed)
+            self._save_index()
+        raw_path.unlink(missing_ok=True)
+
+    def flush(self):
+        """Wait for pending background compression to finish"""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    # Reading and references
+
+    @staticmethod
+    def digest(ref: str) -> str:
+        if not ref.startswith(REF_PREFIX):
+            raise ValueError(f"Not an artifact reference: {ref}")
+        return ref[len(REF_PREFIX):]
+
+    def get_bytes(self, ref: str) -> bytes:
+        """
+        Return the content of an artifact
+
+        Images recompressed in the background come back as their optimized
+        encoding; the pixels are unchanged but the bytes may differ.
+        """
+        digest = self.digest(ref)
+        for _ in range(2):
+            with self._lock:
+                entry = self._index.get(digest)
+                if entry is None:
+                    raise KeyError(ref)
+                entry['last_used'] = time.time()
+                encoding = entry['encoding']
+            try:
+                data = self._object_path(digest, encoding).read_bytes()
+                break
+            except FileNotFoundError:
+                # Compressed concurrently; re-read the index once
+                continue
+        else:
+            raise KeyError(ref)
+
+        if encoding == "zst":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read this artifact")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if encoding == "gz":
+            return gzip.decompress(data)
+        return data
+
+    def get_text(self, ref: str) -> str:
+        return self.get_bytes(ref).decode('utf-8')
+
+    def path(self, ref: str) -> Path:
+        """Return the on-disk file of an artifact (compressed logs are not readable directly)"""
+        digest = self.digest(ref)
+        with self._lock:
+            entry = self._index.get(digest)
+            if entry is None:
+                raise KeyError(ref)
+            return self._object_path(digest, entry['encoding'])
+
+    def add_ref(self, ref: str):
+        with self._lock:
+            entry = self._index[self.digest(ref)]
+            entry['refs'] += 1
+            entry['last_used'] = time.time()
+            self._save_index()
+
+    def release(self, ref: str):
+        """Drop one reference; the object is removed by the next gc()"""
+        with self._lock:
+            entry = self._index.get(self.digest(ref))
+            if entry is not None and entry['refs'] > 0:
+                entry['refs'] -= 1
+                self._save_index()
+
+    def gc(self) -> int:
+        """
+        Delete unreferenced objects and those unused for the retention period
+
+        Returns:
+            int: Bytes freed on disk
+        """
+        self.flush()
+        cutoff = time.time() - self.retention
+        freed = 0
+        with self._lock:
+            for digest, entry in list(self._index.items()):
+                if entry['refs'] > 0 and entry['last_used'] >= cutoff:
+                    continue
+                self._object_path(digest, entry['encoding']).unlink(missing_ok=True)
+                freed += entry['stored_size']
+                del self._index[digest]
+            self._save_index()
+        return freed
+
+    def stats(self) -> dict:
+        """Summarize object count, logical size and on-disk size"""
+        with self._lock:
+            entries = list(self._index.values())
+        return {
+            'objects': len(entries),
+            'logical_bytes': sum(e['size'] * max(e['refs'], 1) for e in entries),
+            'stored_bytes': sum(e['stored_size'] for e in entries)
+        }
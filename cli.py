@@ -0,0 +1,318 @@
+"""
+Headless entry point for running Jest tests without Streamlit
+
+Usage:
+    python -m cli run <preset> [--workers N] [--shard I/N] [--format json|junit] [--output FILE]
+    python -m cli run --test <pattern> [--test <pattern> ...]
+    python -m cli coordinate <preset> [--port PORT] [--batch-size N]
+    python -m cli worker --coordinator http://HOST:PORT [--workers N]
+    python -m cli watch [--project-dir DIR] [--poll]
+    python -m cli list
+"""
+import argparse
+import ipaddress
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+from distributed import Coordinator, Worker
+from presets import PresetManager
+from test_report import results_to_junit
+from test_runner import TestRunner
+from utils import TestIndex
+
+EXCLUDE_PATTERNS = ['node_modules', 'coverage', 'dist']
+
+_print_lock = threading.Lock()
+
+def log(message: str):
+    """Write a progress line to stderr, keeping stdout free for reports"""
+    with _print_lock:
+        print(message, file=sys.stderr, flush=True)
+
+def make_event_handler(verbose: bool):
+    """Build a TestRunner event handler that logs to stderr"""
+    def handle(kind: str, message: str):
+        if kind in ("stdout", "stderr"):
+            if verbose:
+                log(message.rstrip())
+        elif kind in ("error", "concurrency") or verbose:
+            log(message)
+    return handle
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse a 1-based shard spec such as '2/4'"""
+    try:
+        index, total = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected I/N")
+    if total < 1 or not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected 1 <= I <= N")
+    return index, total
+
+def select_shard(patterns: list[str], shard: tuple[int, int] | None) -> list[str]:
+    """Return the patterns belonging to a shard (round-robin assignment)"""
+    if shard is None:
+        return patterns
+    index, total = shard
+    return patterns[index - 1::total]
+
+def resolve_patterns(args) -> list[str]:
+    """
+    Collect test patterns from the requested preset and/or --test options
+
+    Test files are returned as file IDs relative to --project-dir, which
+    is what remote workers resolve against their own checkout.
+    """
+    manager = PresetManager(args.presets_file)
+    index = TestIndex(args.project_dir, EXCLUDE_PATTERNS)
+    index.scan()
+    patterns = [manager.to_entry(pattern, index) for pattern in args.test or []]
+    if args.preset:
+        if args.preset not in manager.load_presets():
+            raise SystemExit(f"Unknown preset: {args.preset}")
+        resolved, stale = manager.resolve_preset(args.preset, index)
+        for entry in stale:
+            log(f"⚠️ Skipping missing file from preset '{args.preset}': {entry}")
+        patterns = resolved + patterns
+    if not patterns:
+        raise SystemExit("Nothing to run: pass a preset name or at least one --test")
+    return patterns
+
+def write_report(results: list, args):
+    """Write results in the requested format to --output or stdout"""
+    if args.format == "junit":
+        report = results_to_junit(results, suite_name=args.preset or "jest")
+    else:
+        report = json.dumps(results, indent=2, default=str)
+
+    if args.output:
+        Path(args.output).write_text(report)
+        log(f"📝 Report written to {args.output}")
+    else:
+        print(report)
+
+def make_runner(args) -> TestRunner:
+    """Construct a TestRunner for --project-dir with CLI logging"""
+    try:
+        runner = TestRunner(
+            str(Path(args.project_dir).resolve()),
+            on_event=make_event_handler(args.verbose)
+        )
+    except ValueError as e:
+        raise SystemExit(f"Error initializing TestRunner: {e}")
+    if args.timeout:
+        runner.timeout = args.timeout
+    if args.network != "live":
+        runner.env['NETWORK_MODE'] = args.network
+    if args.adaptive and args.workers <= 1:
+        log("⚠️ --adaptive is ignored with a single worker; set the upper bound with --workers N")
+    return runner
+
+def report_progress(result: dict):
+    worker = f" [{result['Worker']}]" if 'Worker' in result else ""
+    log(f"{result['Status']} {result['Test']} ({result['Duration']}){worker}")
+
+def summarize(results: list, runner: TestRunner = None) -> int:
+    """Log the pass count and return the process exit code"""
+    passed = sum(1 for r in results if r['Status'] == '✅ PASS')
+    log(f"📊 {passed}/{len(results)} passed")
+    if runner is not None and runner.cache_stats['runs']:
+        log(f"🗄️ Jest cache: {runner.cache_stats['new_entries']} new transform(s) over "
+            f"{runner.cache_stats['runs']} run(s) ({runner.cache_dir})")
+    return 0 if passed == len(results) else 1
+
+def run_visual_diff(args) -> list:
+    """Compare the project's screenshots with their baselines and return result rows"""
+    from visual_diff import compare_project, to_result_rows
+
+    diffs = compare_project(
+        args.project_dir, threshold=args.visual_threshold, update_baselines=args.update_baselines
+    )
+    rows = to_result_rows(diffs)
+    for row in rows:
+        report_progress(row)
+    return rows
+
+def prewarm(runner: TestRunner):
+    """Transform the project's test files and their imports into the shared Jest cache"""
+    index = TestIndex(runner.project_dir, EXCLUDE_PATTERNS)
+    summary = runner.prewarm_cache(index.scan())
+    if summary is None:
+        log("🔥 Skipping Jest cache pre-warm (jest not installed)")
+    else:
+        log(f"🔥 Pre-warmed {summary['files']} module(s), {summary['new_entries']} new transform(s)")
+
+def cmd_run(args) -> int:
+    patterns = select_shard(resolve_patterns(args), args.shard)
+    runner = make_runner(args)
+    if args.prewarm:
+        prewarm(runner)
+
+    log(f"🚀 Running {len(patterns)} test pattern(s) with {args.workers} worker(s)")
+    results = runner.run_tests(
+        patterns, max_workers=args.workers, on_result=report_progress, adaptive=args.adaptive
+    )
+    if args.visual:
+        results += run_visual_diff(args)
+    write_report(results, args)
+    return summarize(results, runner)
+
+def is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+def cmd_coordinate(args) -> int:
+    patterns = select_shard(resolve_patterns(args), args.shard)
+    coordinator = Coordinator(
+        patterns,
+        batch_size=args.batch_size,
+        lease_timeout=args.lease_timeout,
+        on_result=report_progress,
+        token=args.token
+    )
+    if args.token is None and not is_loopback(args.host):
+        log(f"⚠️ Listening on {args.host} without --token: anyone who can reach this port "
+            "can register as a worker or submit results. Set --token or PUPPETUI_TOKEN.")
+    host, port = coordinator.serve(args.host, args.port)
+    log(f"📡 Coordinating {len(patterns)} test pattern(s) on http://{host}:{port}")
+    try:
+        coordinator.wait()
+        # Give polling workers a moment to receive the completion signal
+        time.sleep(args.linger)
+    finally:
+        coordinator.shutdown()
+
+    results = coordinator.results()
+    write_report(results, args)
+    return summarize(results)
+
+def cmd_worker(args) -> int:
+    runner = make_runner(args)
+    if args.prewarm:
+        prewarm(runner)
+    worker = Worker(args.coordinator, runner, name=args.name,
+                    max_workers=args.workers, adaptive=args.adaptive,
+                    token=args.token, exclude_patterns=EXCLUDE_PATTERNS)
+    worker.register(retry_for=args.connect_timeout)
+    log(f"🛠️ Registered with {args.coordinator} as {worker.worker_id}")
+    completed = worker.run(on_result=report_progress)
+    log(f"🏁 Worker finished after {completed} test pattern(s)")
+    return 0
+
+def cmd_watch(args) -> int:
+    from watcher import TestWatcher
+
+    runner = make_runner(args)
+    index = TestIndex(runner.project_dir, EXCLUDE_PATTERNS)
+    index.scan()
+    changes = queue.Queue()
+    watcher = TestWatcher(index, changes.put, debounce=args.debounce, use_polling=args.poll)
+    watcher.start()
+    log(f"👀 Watching {runner.project_dir} ({watcher.backend}, {len(index.files)} test files)")
+
+    try:
+        while True:
+            affected = dict.fromkeys(changes.get())
+            # Fold in anything that changed while the previous batch was running
+            while not changes.empty():
+                affected.update(dict.fromkeys(changes.get_nowait()))
+            patterns = [str(path) for path in affected]
+            log(f"🔁 {len(patterns)} affected test file(s)")
+            results = runner.run_tests(
+                patterns, max_workers=args.workers, on_result=report_progress, adaptive=args.adaptive
+            )
+            summarize(results, runner)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.stop()
+
+def cmd_list(args) -> int:
+    for name, tests in PresetManager(args.presets_file).load_presets().items():
+        print(f"{name} ({len(tests)} entries)")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Run Jest test presets headlessly")
+    parser.add_argument("--presets-file", default="test_presets.json", help="Path to the presets JSON file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_selection_args(sub):
+        sub.add_argument("preset", nargs="?", help="Name of the preset to run")
+        sub.add_argument("--test", action="append", help="Extra test pattern (file path or -t '<name>'); repeatable")
+        sub.add_argument("--shard", type=parse_shard, help="Only run shard I of N, e.g. 2/4")
+        sub.add_argument("--format", choices=["json", "junit"], default="json", help="Report format")
+        sub.add_argument("--output", help="Write the report to this file instead of stdout")
+
+    def add_execution_args(sub):
+        sub.add_argument("--project-dir", default=str(Path.cwd()), help="Directory containing package.json")
+        sub.add_argument("--workers", type=int, default=1, help="Number of concurrent Jest processes")
+        sub.add_argument("--adaptive", action="store_true",
+                         help="Treat --workers as an upper bound and scale with CPU/memory pressure")
+        sub.add_argument("--timeout", type=int, help="Per-test timeout in seconds")
+        sub.add_argument("--network", choices=["live", "record", "replay"], default="live",
+                         help="Serve page loads live, record them, or replay recorded responses")
+        sub.add_argument("-v", "--verbose", action="store_true", help="Echo commands and Jest output")
+        sub.add_argument("--prewarm", action="store_true",
+                         help="Transform test files and their imports into the shared Jest cache first")
+
+    run = subparsers.add_parser("run", help="Run a preset and/or explicit test patterns")
+    add_selection_args(run)
+    add_execution_args(run)
+    run.add_argument("--visual", action="store_true",
+                     help="Compare report/screenshots with report/baselines after the run")
+    run.add_argument("--visual-threshold", type=float, default=0.1,
+                     help="Per-pixel colour tolerance for --visual, between 0 and 1")
+    run.add_argument("--update-baselines", action="store_true",
+                     help="With --visual, replace baselines with the new screenshots")
+    run.set_defaults(func=cmd_run)
+
+    coordinate = subparsers.add_parser("coordinate", help="Serve a preset to remote worker agents")
+    add_selection_args(coordinate)
+    coordinate.add_argument("--project-dir", default=str(Path.cwd()), help="Directory containing package.json")
+    coordinate.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    coordinate.add_argument("--port", type=int, default=8765, help="Port to listen on (0 picks a free port)")
+    coordinate.add_argument("--batch-size", type=int, default=1, help="Test patterns handed out per lease")
+    coordinate.add_argument("--lease-timeout", type=float, default=900,
+                            help="Seconds before an unfinished batch is handed to another worker")
+    coordinate.add_argument("--linger", type=float, default=2.0,
+                            help="Seconds to keep serving after completion so workers can exit cleanly")
+    coordinate.add_argument("--token", default=os.environ.get("PUPPETUI_TOKEN"),
+                            help="Shared secret workers must send (default: $PUPPETUI_TOKEN)")
+    coordinate.set_defaults(func=cmd_coordinate)
+
+    worker = subparsers.add_parser("worker", help="Run batches leased from a coordinator")
+    add_execution_args(worker)
+    worker.add_argument("--coordinator", required=True, help="Coordinator URL, e.g. http://127.0.0.1:8765")
+    worker.add_argument("--name", help="Worker name reported with results (default: hostname)")
+    worker.add_argument("--connect-timeout", type=float, default=30,
+                        help="Seconds to keep retrying registration")
+    worker.add_argument("--token", default=os.environ.get("PUPPETUI_TOKEN"),
+                        help="Shared secret expected by the coordinator (default: $PUPPETUI_TOKEN)")
+    worker.set_defaults(func=cmd_worker)
+
+    watch = subparsers.add_parser("watch", help="Re-run affected tests whenever files change")
+    add_execution_args(watch)
+    watch.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify")
+    watch.add_argument("--debounce", type=float, default=0.2,
+                       help="Seconds of quiet before a burst of changes is processed")
+    watch.set_defaults(func=cmd_watch)
+
+    list_cmd = subparsers.add_parser("list", help="List saved presets")
+    list_cmd.set_defaults(func=cmd_list)
+
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Adaptive control of the number of concurrent Jest processes
+
+The controller samples CPU utilisation (from /proc/stat deltas), CPU
+contention (the 10-second PSI average, or the instantaneous run queue where
+PSI is unavailable), available memory, and the RSS of every tracked Jest
+process tree. It moves the concurrency limit between min_workers and
+max_workers, at most one step per cooldown in either direction so each
+change can take effect before the next is made. On systems without /proc
+the limit stays at max_workers.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+PROC = Path("/proc")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def read_cpu_times() -> Optional[tuple[int, int, int]]:
+    """Return (busy jiffies, total jiffies, runnable tasks) from /proc/stat, or None"""
+    try:
+        lines = (PROC / "stat").read_text().splitlines()
+        # user nice system idle iowait irq softirq steal; guest time is already in user
+        times = [int(value) for value in lines[0].split()[1:9]]
+        running = next(int(line.split()[1]) for line in lines if line.startswith("procs_running "))
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+    idle = times[3] + times[4]
+    return sum(times) - idle, sum(times), running
+
+def read_cpu_pressure() -> Optional[float]:
+    """Return the share of the last 10s some task waited for a CPU (PSI), or None"""
+    try:
+        for line in (PROC / "pressure" / "cpu").read_text().splitlines():
+            if line.startswith("some "):
+                fields = dict(field.split("=") for field in line.split()[1:])
+                return float(fields["avg10"]) / 100
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def read_mem_available() -> Optional[int]:
+    """Return MemAvailable in bytes, or None if unavailable"""
+    try:
+        for line in (PROC / "meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def read_children_map() -> dict[int, list[int]]:
+    """Map each PID to its direct children by scanning /proc/*/stat"""
+    children: dict[int, list[int]] = {}
+    try:
+        entries = list(PROC.iterdir())
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces, so split after its closing paren
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) > 1:
+            children.setdefault(int(fields[1]), []).append(int(entry.name))
+    return children
+
+def read_tree_rss(pid: int, children: dict[int, list[int]]) -> int:
+    """Return the summed RSS in bytes of a process and all its descendants"""
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            total += int((PROC / str(current) / "statm").read_text().split()[1]) * PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            continue
+        stack.extend(children.get(current, []))
+    return total
+
+class ConcurrencyController:
+    def __init__(self, max_workers: int, min_workers: int = 1, interval: float = 2.0,
+                 cooldown: Optional[float] = None, min_available_mb: int = 512,
+                 high_pressure: float = 0.3, low_pressure: float = 0.1, max_cpu: float = 0.85,
+                 on_decision: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            max_workers: Upper bound on concurrent processes
+            min_workers: Lower bound on concurrent processes
+            interval: Seconds between samples
+            cooldown: Minimum seconds between limit changes (default: three intervals)
+            min_available_mb: Memory headroom below which concurrency is reduced
+            high_pressure: CPU contention above which concurrency is reduced
+            low_pressure: CPU contention below which concurrency may grow
+            max_cpu: CPU utilisation below which concurrency may grow
+            on_decision: Called with a log line whenever the limit changes
+        """
+        self.max_workers = max(1, max_workers)
+        self.min_workers = max(1, min(min_workers, self.max_workers))
+        self.interval = interval
+        self.cooldown = cooldown if cooldown is not None else interval * 3
+        self.min_available = min_available_mb * 1024 * 1024
+        self.high_pressure = high_pressure
+        self.low_pressure = low_pressure
+        self.max_cpu = max_cpu
+        self.on_decision = on_decision
+        self.cpu_count = os.cpu_count() or 1
+
+        # Start conservatively: Chromium alone uses more than one core
+        self.limit = max(self.min_workers, min(self.max_workers, self.cpu_count // 2 or 1))
+        self.active = 0
+        self.decisions: list[dict] = []
+
+        self._tracked: set[int] = set()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_change = 0.0
+        self._last_cpu = read_cpu_times()
+
+    # Slot management
+
+    @contextmanager
+    def slot(self):
+        """Block until the current limit allows another process, then hold a slot"""
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+    def track(self, pid: int):
+        """Include a process tree in RSS sampling"""
+        with self._condition:
+            self._tracked.add(pid)
+
+    def untrack(self, pid: int):
+        with self._condition:
+            self._tracked.discard(pid)
+
+    # Sampling and decisions
+
+    def sample(self) -> dict:
+        """Take one reading of system pressure and tracked process RSS"""
+        with self._condition:
+            tracked = list(self._tracked)
+        children = read_children_map() if tracked else {}
+        tree_rss = [read_tree_rss(pid, children) for pid in tracked]
+
+        cpu_busy, runnable = None, None
+        cpu = read_cpu_times()
+        if cpu is not None:
+            runnable = cpu[2]
+            if self._last_cpu is not None and cpu[1] > self._last_cpu[1]:
+                cpu_busy = (cpu[0] - self._last_cpu[0]) / (cpu[1] - self._last_cpu[1])
+        self._last_cpu = cpu
+
+        pressure = read_cpu_pressure()
+        if pressure is None and runnable is not None:
+            # No PSI: share of runnable tasks that have no CPU to run on
+            pressure = max(0, runnable - self.cpu_count) / runnable if runnable else 0.0
+        return {
+            'cpu_busy': cpu_busy,
+            'cpu_pressure': pressure,
+            'mem_available': read_mem_available(),
+            'avg_rss': sum(tree_rss) / len(tree_rss) if tree_rss else None,
+            'active': self.active,
+        }
+
+    def decide(self, sample: dict, now: Optional[float] = None) -> tuple[int, str]:
+        """Return the new limit and the reason for it"""
+        cpu_busy, pressure = sample['cpu_busy'], sample['cpu_pressure']
+        available, avg_rss = sample['mem_available'], sample['avg_rss']
+        if pressure is None or available is None:
+            return self.max_workers, "no /proc metrics, using max workers"
+        if cpu_busy is None:
+            return self.limit, "warming up"
+
+        now = time.time() if now is None else now
+        if now - self._last_change < self.cooldown:
+            return self.limit, "cooling down"
+
+        if available < self.min_available:
+            return max(self.min_workers, self.limit - 1), f"low memory ({available // 2**20} MiB available)"
+        if pressure > self.high_pressure:
+            return max(self.min_workers, self.limit - 1), (
+                f"CPU contention ({pressure:.0%} stalled, {cpu_busy:.0%} busy)"
+            )
+
+        # Only grow when saturated, the CPUs have headroom and another tree fits in memory
+        needed = (avg_rss or 0) * 1.5 + self.min_available
+        if (sample['active'] >= self.limit and cpu_busy < self.max_cpu
+                and pressure < self.low_pressure and available > needed):
+            return min(self.max_workers, self.limit + 1), (
+                f"headroom ({cpu_busy:.0%} CPU busy, {available // 2**20} MiB available)"
+            )
+        return self.limit, "steady"
+
+    def adjust(self) -> int:
+        """Sample once and apply the resulting limit"""
+        sample = self.sample()
+        limit, reason = self.decide(sample)
+        if limit != self.limit:
+            with self._condition:
+                previous, self.limit = self.limit, limit
+                self._last_change = time.time()
+                self._condition.notify_all()
+            self.decisions.append(dict(sample, time=self._last_change, limit=limit, reason=reason))
+            if self.on_decision is not None:
+                self.on_decision(f"⚖️ Concurrency {previous} → {limit}: {reason}")
+        return self.limit
+
+    def start(self):
+        """Start sampling in a background thread"""
+        if self.on_decision is not None:
+            self.on_decision(f"⚖️ Adaptive concurrency starting at {self.limit} (max {self.max_workers})")
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                self.adjust()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,279 @@
+"""
+Coordinator/worker execution of test patterns across several machines
+
+The coordinator owns the queue of test patterns and serves a small JSON
+over HTTP protocol; workers register, lease batches, run them with a local
+TestRunner and post the result rows back. Test files are sent as
+project-relative file IDs, so each worker resolves them against its own
+checkout. Leases that are not completed within lease_timeout seconds are
+returned to the queue.
+
+When a token is set, every request must carry it in the X-PuppetUI-Token
+header. Workers only run leased entries that are -t '<name>' filters or
+file IDs present in their own TestIndex.
+"""
+import hmac
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from test_runner import TestRunner, build_result, is_name_pattern_entry
+from utils import TestIndex
+
+TOKEN_HEADER = 'X-PuppetUI-Token'
+
+class Coordinator:
+    def __init__(self, test_patterns: list[str], batch_size: int = 1, lease_timeout: float = 900,
+                 on_result: Optional[Callable[[dict], None]] = None, token: Optional[str] = None):
+        self.test_patterns = list(test_patterns)
+        self.batch_size = max(1, batch_size)
+        self.lease_timeout = lease_timeout
+        self.on_result = on_result
+        self.token = token
+
+        self._lock = threading.Lock()
+        self._pending = deque(range(len(self.test_patterns)))
+        self._leases: dict[str, dict] = {}
+        self._results: dict[int, dict] = {}
+        self._workers: dict[str, dict] = {}
+        self._next_worker = 0
+        self._next_batch = 0
+        self._finished = threading.Event()
+        if not self.test_patterns:
+            self._finished.set()
+        self._server = None
+
+    # Protocol handlers
+
+    def register(self, name: str) -> dict:
+        """Register a worker and return its ID"""
+        with self._lock:
+            self._next_worker += 1
+            worker_id = f"w{self._next_worker}"
+            self._workers[worker_id] = {'name': name, 'registered': time.time(), 'completed': 0}
+        return {'worker_id': worker_id}
+
+    def lease(self, worker_id: str) -> dict:
+        """Hand the next batch of tests to a worker"""
+        with self._lock:
+            if worker_id not in self._workers:
+                return {'error': f"Unknown worker: {worker_id}"}
+            self._requeue_expired()
+            if self._finished.is_set():
+                return {'done': True}
+            if not self._pending:
+                # Everything is leased; ask the worker to poll again in case a lease expires
+                return {'wait': 1.0}
+
+            indices = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._next_batch += 1
+            batch_id = f"b{self._next_batch}"
+            self._leases[batch_id] = {
+                'worker_id': worker_id,
+                'indices': indices,
+                'expires': time.time() + self.lease_timeout
+            }
+            return {'batch_id': batch_id, 'tests': [self.test_patterns[i] for i in indices]}
+
+    def complete(self, worker_id: str, batch_id: str, results: list[dict]) -> dict:
+        """Record the results of a leased batch"""
+        with self._lock:
+            lease = self._leases.pop(batch_id, None)
+            if lease is None or lease['worker_id'] != worker_id:
+                # Expired and re-leased elsewhere; the other copy wins
+                return {'accepted': False}
+
+            worker_name = self._workers[worker_id]['name']
+            accepted = []
+            for index, result in zip(lease['indices'], results):
+                if index in self._results:
+                    continue
+                result = dict(result, Worker=worker_name)
+                self._results[index] = result
+                accepted.append(result)
+            # Requeue anything the worker did not report on
+            for index in lease['indices'][len(results):]:
+                self._pending.append(index)
+
+            self._workers[worker_id]['completed'] += len(accepted)
+            if len(self._results) == len(self.test_patterns):
+                self._finished.set()
+
+        if self.on_result is not None:
+            for result in accepted:
+                self.on_result(result)
+        return {'accepted': True}
+
+    def _requeue_expired(self):
+        now = time.time()
+        for batch_id, lease in list(self._leases.items()):
+            if lease['expires'] < now:
+                del self._leases[batch_id]
+                self._pending.extendleft(reversed(lease['indices']))
+
+    # Server lifecycle
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> tuple[str, int]:
+        """Start serving in a background thread and return the bound address"""
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if coordinator.token is not None and not hmac.compare_digest(
+                    self.headers.get(TOKEN_HEADER, '').encode(), coordinator.token.encode()
+                ):
+                    self.send_error(403, "Missing or wrong token")
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                    if self.path == '/register':
+                        response = coordinator.register(payload.get('name', self.client_address[0]))
+                    elif self.path == '/lease':
+                        response = coordinator.lease(payload['worker_id'])
+                    elif self.path == '/results':
+                        response = coordinator.complete(
+                            payload['worker_id'], payload['batch_id'], payload['results']
+                        )
+                    else:
+                        self.send_error(404)
+                        return
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[:2]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every test has a result"""
+        return self._finished.wait(timeout)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def results(self) -> list[dict]:
+        """Result rows in the order of the original test patterns"""
+        with self._lock:
+            return [self._results[i] for i in sorted(self._results)]
+
+class Worker:
+    def __init__(self, coordinator_url: str, runner: TestRunner, name: Optional[str] = None,
+                 max_workers: int = 1, adaptive: bool = False, token: Optional[str] = None,
+                 exclude_patterns: Optional[list[str]] = None):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.runner = runner
+        self.name = name or socket.gethostname()
+        self.max_workers = max_workers
+        self.adaptive = adaptive
+        self.token = token
+        self.index = TestIndex(runner.project_dir, exclude_patterns)
+        self.worker_id = None
+
+    def _post(self, path: str, payload: dict) -> dict:
+        headers = {'Content-Type': 'application/json'}
+        if self.token is not None:
+            headers[TOKEN_HEADER] = self.token
+        request = urllib.request.Request(
+            f"{self.coordinator_url}{path}",
+            data=json.dumps(payload).encode(),
+            headers=headers
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+
+    def register(self, retry_for: float = 30) -> str:
+        """Register with the coordinator, retrying while it starts up"""
+        deadline = time.time() + retry_for
+        while True:
+            try:
+                self.worker_id = self._post('/register', {'name': self.name})['worker_id']
+                return self.worker_id
+            except urllib.error.HTTPError:
+                # The coordinator is up but refused us (e.g. wrong token)
+                raise
+            except (urllib.error.URLError, ConnectionError):
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def is_runnable(self, entry: str) -> bool:
+        """Accept only test name filters and file IDs indexed in this checkout"""
+        if is_name_pattern_entry(entry):
+            return True
+        if entry not in self.index.files:
+            # Pick up test files added since the last scan
+            self.index.scan()
+        return entry in self.index.files
+
+    def run_batch(self, tests: list[str], on_result: Optional[Callable[[dict], None]] = None) -> list[dict]:
+        """Run a leased batch, failing entries that are not runnable here without executing them"""
+        runnable = [entry for entry in tests if self.is_runnable(entry)]
+        results = dict(zip(runnable, self.runner.run_tests(
+            runnable, max_workers=self.max_workers, on_result=on_result, adaptive=self.adaptive
+        )))
+        rows = []
+        for entry in tests:
+            if entry not in results:
+                results[entry] = build_result(
+                    entry, False, f"Rejected leased entry (not a -t filter or indexed test file): {entry!r}", 0.0
+                )
+                if on_result is not None:
+                    on_result(results[entry])
+            rows.append(results[entry])
+        return rows
+
+    def run(self, on_result: Optional[Callable[[dict], None]] = None) -> int:
+        """Lease and run batches until the coordinator reports completion"""
+        if self.worker_id is None:
+            self.register()
+        self.index.scan()
+
+        completed = 0
+        while True:
+            try:
+                lease = self._post('/lease', {'worker_id': self.worker_id})
+            except (urllib.error.URLError, ConnectionError):
+                # Coordinator has gone away, which only happens once the run is over
+                return completed
+            if lease.get('done'):
+                return completed
+            if 'error' in lease:
+                raise RuntimeError(lease['error'])
+            if 'wait' in lease:
+                time.sleep(lease['wait'])
+                continue
+
+            results = self.run_batch(lease['tests'], on_result)
+            try:
+                response = self._post('/results', {
+                    'worker_id': self.worker_id,
+                    'batch_id': lease['batch_id'],
+                    'results': results
+                })
+            except (urllib.error.URLError, ConnectionError):
+                # The lease expired and the run finished without this batch
+                return completed
+            if response.get('accepted'):
+                completed += len(results)
@@ -0,0 +1,96 @@
+// Pre-warm a Jest transform cache without running any tests.
+//
+// Usage (from the Jest project directory):
+//   node jest_prewarm.js <cacheDirectory> <configPath|-> <file> [<file> ...]
+//
+// Each file is passed through Jest's ScriptTransformer with the project's own
+// config and the options jest-runtime uses for CommonJS modules, so the cache
+// keys match the ones a real run reads. Prints a JSON summary:
+// {"files": n, "new_entries": n, "errors": [...]}.
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const projectDir = process.cwd();
+const [cacheDirectory, configPath, ...files] = process.argv.slice(2);
+
+function projectRequire(name) {
+  return require(require.resolve(name, { paths: [projectDir] }));
+}
+
+// Counts transform results only, matching TestRunner._count_cache_entries
+function countCacheEntries(dir) {
+  let count = 0;
+  let stack;
+  try {
+    stack = fs.readdirSync(dir)
+      .filter((name) => name.startsWith('jest-transform-cache-'))
+      .map((name) => path.join(dir, name));
+  } catch {
+    return 0;
+  }
+  while (stack.length) {
+    const current = stack.pop();
+    let entries;
+    try {
+      entries = fs.readdirSync(current, { withFileTypes: true });
+    } catch {
+      continue;
+    }
+    for (const entry of entries) {
+      if (entry.isDirectory()) {
+        stack.push(path.join(current, entry.name));
+      } else if (!entry.name.endsWith('.map')) {
+        count += 1;
+      }
+    }
+  }
+  return count;
+}
+
+async function main() {
+  const { readConfig } = projectRequire('jest-config');
+  const { createScriptTransformer } = projectRequire('@jest/transform');
+
+  const argv = { _: [], $0: 'jest', cacheDirectory };
+  if (configPath && configPath !== '-') argv.config = configPath;
+  const { globalConfig, projectConfig } = await readConfig(argv, projectDir);
+  const transformer = await createScriptTransformer(projectConfig);
+
+  // jest-runtime's defaultTransformOptions merged with the coverage options
+  // jest-runner passes in; transformers such as babel-jest fold these into
+  // their cache keys. ScriptTransformer derives `instrument` from them.
+  const transformOptions = {
+    isInternalModule: false,
+    supportsDynamicImport: typeof vm.SourceTextModule === 'function',
+    supportsExportNamespaceFrom: false,
+    supportsStaticESM: false,
+    supportsTopLevelAwait: false,
+    changedFiles: undefined,
+    collectCoverage: globalConfig.collectCoverage,
+    collectCoverageFrom: globalConfig.collectCoverageFrom,
+    coverageProvider: globalConfig.coverageProvider,
+    sourcesRelatedToTestsInChangedFiles: undefined,
+  };
+
+  const summary = { files: 0, new_entries: 0, errors: [] };
+  const before = countCacheEntries(cacheDirectory);
+  for (const file of files) {
+    const filename = path.resolve(projectDir, file);
+    if (!transformer.shouldTransform(filename)) continue;
+    try {
+      transformer.transform(filename, transformOptions);
+    } catch (error) {
+      summary.errors.push(`${file}: ${error.message}`);
+      continue;
+    }
+    summary.files += 1;
+  }
+  summary.new_entries = Math.max(0, countCacheEntries(cacheDirectory) - before);
+  process.stdout.write(JSON.stringify(summary));
+}
+
+main().catch((error) => {
+  process.stderr.write(`${error.stack || error}\n`);
+  process.exit(1);
+});
@@ -1,23 +1,84 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from pathlib import Path
 from test_runner import TestRunner
-from utils import scan_test_files, parse_test_commands
+from utils import parse_test_commands, TestIndex
 from presets import PresetManager
 from test_report import TestReportExporter
-import time
+from artifacts import ArtifactStore
 from datetime import datetime, timedelta
+import queue
 import random
 
+HISTORY_LIMIT = 1000
+SCREENSHOT_GLOB = 'report/screenshots/**/*.png'
+# Seconds without a rerun of the watch fragment before a session's watcher stops
+WATCHER_IDLE_TIMEOUT = 120
+
 st.set_page_config(
     page_title="Jest Test Runner",
     page_icon="🧪",
     layout="wide"
 )
 
-with open('styles.css') as f:
-    st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+def file_mtime(path) -> float:
+    """Return the modification time of a file, or 0.0 if it does not exist"""
+    try:
+        return Path(path).stat().st_mtime
+    except OSError:
+        return 0.0
+
+@st.cache_data(show_spinner=False)
+def load_styles(path: str, mtime: float) -> str:
+    """Read the stylesheet once per modification of the file"""
+    with open(path) as f:
+        return f.read()
+
+def render_runner_event(kind: str, message: str):
+    """Render TestRunner events in the current Streamlit run"""
+    if kind == "success":
+        st.success(message)
+    elif kind == "error":
+        st.error(message)
+    elif kind == "stdout":
+        st.write("📤 Raw output:")
+        st.code(message, language="bash")
+    elif kind == "stderr":
+        st.write("⚠️ Error output:")
+        st.code(message, language="bash")
+    else:
+        st.write(message)
+
+@st.cache_resource(show_spinner=False)
+def get_test_runner(project_dir: str, package_mtime: float) -> TestRunner:
+    """Shared TestRunner per project directory, rebuilt when package.json changes"""
+    return TestRunner(project_dir, on_event=render_runner_event)
+
+@st.cache_resource(show_spinner=False)
+def get_preset_manager(presets_file: str) -> PresetManager:
+    """Shared PresetManager per presets file"""
+    return PresetManager(presets_file)
+
+@st.cache_resource(show_spinner=False)
+def get_report_exporter() -> TestReportExporter:
+    """Shared TestReportExporter"""
+    return TestReportExporter()
+
+@st.cache_resource(show_spinner=False)
+def get_artifact_store(root: str) -> ArtifactStore:
+    """Shared ArtifactStore, garbage-collected at process start and after history overflow"""
+    store = ArtifactStore(root)
+    store.gc()
+    return store
+
+def load_test_runner(project_dir: str) -> TestRunner:
+    """Fetch the cached TestRunner for a project directory"""
+    resolved = str(Path(project_dir).resolve())
+    return get_test_runner(resolved, file_mtime(Path(resolved) / 'package.json'))
+
+st.markdown(
+    f'<style>{load_styles("styles.css", file_mtime("styles.css"))}</style>',
+    unsafe_allow_html=True
+)
 
 class JestTestUI:
     def __init__(self):
@@ -25,13 +86,14 @@ class JestTestUI:
             st.session_state.project_dir = str(Path.cwd())
             
         try:
-            self.test_runner = TestRunner(st.session_state.project_dir)
+            self.test_runner = load_test_runner(st.session_state.project_dir)
         except ValueError as e:
             st.error(f"Error initializing TestRunner: {str(e)}")
             self.test_runner = None
             
-        self.preset_manager = PresetManager()
-        self.report_exporter = TestReportExporter()
+        self.preset_manager = get_preset_manager("test_presets.json")
+        self.report_exporter = get_report_exporter()
+        self.artifact_store = get_artifact_store("artifacts")
         
         if 'test_files' not in st.session_state:
             st.session_state.test_files = []
@@ -50,6 +112,13 @@ class JestTestUI:
             st.session_state.preset_loaded = False
         if 'selected_preset_name' not in st.session_state:
             st.session_state.selected_preset_name = None
+        if 'test_index' not in st.session_state:
+            st.session_state.test_index = None
+        if 'visual_results' not in st.session_state:
+            st.session_state.visual_results = None
+        if 'watcher' not in st.session_state:
+            st.session_state.watcher = None
+            st.session_state.watch_queue = queue.Queue()
 
     def render_header(self):
         st.title("🧪 Jest Test Runner")
@@ -68,15 +137,26 @@ class JestTestUI:
                 try:
                     # Update project directory in session state
                     st.session_state.project_dir = directory
-                    # Reinitialize test runner with new directory
-                    self.test_runner = TestRunner(directory)
+                    # Fetch the (cached) test runner for the new directory
+                    self.test_runner = load_test_runner(directory)
                     
                     with st.spinner("Scanning for test files..."):
                         exclude_patterns = ['node_modules', 'coverage', 'dist']
-                        st.session_state.test_files = scan_test_files(directory, exclude_patterns)
+                        # The watcher follows the index, so restart it on the next render
+                        self.stop_watcher()
+                        st.session_state.test_index = TestIndex(directory, exclude_patterns)
+                        st.session_state.test_files = st.session_state.test_index.scan()
                         if st.session_state.test_files:
                             st.session_state.test_commands = parse_test_commands(st.session_state.test_files)
                             st.success(f"Found {len(st.session_state.test_files)} test files!")
+                            with st.spinner("Pre-warming Jest transform cache..."):
+                                self.test_runner.prewarm_cache(st.session_state.test_files)
+                            stale = self.preset_manager.find_stale_entries(st.session_state.test_index)
+                            for name, entries in stale.items():
+                                st.warning(
+                                    f"Preset '{name}' references {len(entries)} missing file(s): "
+                                    + ", ".join(f"`{entry}`" for entry in entries)
+                                )
                         else:
                             st.warning("No test files found in the specified directory. Make sure you have .test.js files in your project.")
                 except ValueError as e:
@@ -106,7 +186,21 @@ class JestTestUI:
                         st.markdown(f"- `{test}`")
                     
                     if st.button("📥 Load Selected Preset", type="primary", key="load_preset"):
-                        st.session_state.selected_tests = st.session_state.presets[selected_preset]
+                        tests = st.session_state.presets[selected_preset]
+                        index = st.session_state.test_index
+                        if index is not None:
+                            file_ids, stale = self.preset_manager.resolve_preset(selected_preset, index)
+                            # Selections use the same absolute paths as the discovered test commands
+                            tests = [
+                                str(index.files[entry]) if entry in index.files else entry
+                                for entry in file_ids
+                            ]
+                            if stale:
+                                st.warning(
+                                    "Skipping missing files: "
+                                    + ", ".join(f"`{entry}`" for entry in stale)
+                                )
+                        st.session_state.selected_tests = list(tests)
                         st.session_state.preset_loaded = True
                         st.session_state.selected_preset_name = selected_preset
         
@@ -118,7 +212,9 @@ class JestTestUI:
                     help="Enter a name for your new preset"
                 )
                 if preset_name and st.button("💾 Save Current Selection", type="primary"):
-                    if self.preset_manager.add_preset(preset_name, st.session_state.selected_tests):
+                    if self.preset_manager.add_preset(
+                        preset_name, st.session_state.selected_tests, st.session_state.test_index
+                    ):
                         st.session_state.presets = self.preset_manager.load_presets()
                         st.success(f"✨ Preset '{preset_name}' saved successfully!")
             else:
@@ -154,21 +250,15 @@ class JestTestUI:
                 try:
                     # Log test execution start
                     log_placeholder.write(f"🚀 Starting test execution: {test_pattern}")
+                    started = datetime.now().timestamp()
                     st.write(f"⚙️ Executing test pattern: `{test_pattern}`")
                     
-                    start_time = time.time()
-                    success, output = self.test_runner.run_test(test_pattern)
-                    duration = round(time.time() - start_time, 2)
-
-                    result = {
-                        'Test': test_pattern,
-                        'Status': '✅ PASS' if success else '❌ FAIL',
-                        'Duration': f'{duration}s',
-                        'Output': output
-                    }
+                    result = self.test_runner.execute(test_pattern, env=self.network_env())
+                    success = result['Status'] == '✅ PASS'
+                    duration = result['Duration'][:-1]
 
                     # Store in history and display results
-                    self.store_test_history([result])
+                    self.store_test_history([result], started)
                     
                     with result_placeholder:
                         if not success:
@@ -190,9 +280,22 @@ class JestTestUI:
                         st.error(f"⚠️ Error running test: {str(e)}")
                         st.error("🔧 Please verify that Jest is properly installed and configured.")
 
+    def network_env(self) -> dict:
+        """Environment selecting the Puppeteer network record/replay mode"""
+        mode = st.session_state.get('network_mode', 'live')
+        return {} if mode == 'live' else {'NETWORK_MODE': mode}
+
     def render_test_selection(self):
         if st.session_state.test_files:
             st.header("🎯 Test Selection")
+
+            st.radio(
+                "🌐 Network",
+                ["live", "record", "replay"],
+                key="network_mode",
+                horizontal=True,
+                help="Record page loads to disk, or replay them offline from the recording"
+            )
             
             test_files = {}
             for cmd in st.session_state.test_commands:
@@ -307,27 +410,52 @@ class JestTestUI:
                         'test': test,
                         'status': status,
                         'duration': max(0.1, duration),
-                        'output': f"Mock output for {test} at {timestamp}"
+                        'output_ref': None,
+                        'screenshots': []
                     }
                     st.session_state.test_history.append(history_entry)
 
-    def store_test_history(self, results):
+    def store_test_history(self, results, started: float):
+        """Append results to history, keeping outputs and new screenshots as artifact references"""
         timestamp = datetime.now()
-        for result in results:
-            history_entry = {
-                'timestamp': timestamp,
-                'test': result['Test'],
-                'status': result['Status'],
-                'duration': float(result['Duration'].replace('s', '')),
-                'output': result['Output']
-            }
-            st.session_state.test_history.append(history_entry)
+        with self.artifact_store.batch():
+            screenshots = []
+            if self.test_runner is not None:
+                screenshots = self.artifact_store.put_recent_files(
+                    self.test_runner.project_dir, SCREENSHOT_GLOB, started
+                )
+            for idx, result in enumerate(results):
+                if idx > 0:
+                    # Every row holds its own reference to the shared screenshots
+                    for ref in screenshots:
+                        self.artifact_store.add_ref(ref)
+                history_entry = {
+                    'timestamp': timestamp,
+                    'test': result['Test'],
+                    'status': result['Status'],
+                    'duration': float(result['Duration'].replace('s', '')),
+                    'output_ref': self.artifact_store.put_text(result['Output']),
+                    'screenshots': screenshots
+                }
+                st.session_state.test_history.append(history_entry)
+
+            # Drop the oldest rows and their artifact references beyond the limit
+            overflow = len(st.session_state.test_history) - HISTORY_LIMIT
+            if overflow > 0:
+                for entry in st.session_state.test_history[:overflow]:
+                    for ref in [entry.get('output_ref')] + entry.get('screenshots', []):
+                        if ref:
+                            self.artifact_store.release(ref)
+                del st.session_state.test_history[:overflow]
+                # Reclaim the space of objects no row references any more
+                self.artifact_store.gc()
 
     def run_tests(self):
         if not st.session_state.selected_tests:
             st.warning("Please select at least one test to run")
             return
 
+        started = datetime.now().timestamp()
         progress_bar = st.progress(0)
         status_text = st.empty()
         results_container = st.container()
@@ -338,25 +466,151 @@ class JestTestUI:
         for idx, test in enumerate(st.session_state.selected_tests, 1):
             status_text.text(f"Running test {idx}/{total_tests}: {test}")
             
-            start_time = time.time()
-            success, output = self.test_runner.run_test(test)
-            duration = round(time.time() - start_time, 2)
-
-            results.append({
-                'Test': test,
-                'Status': '✅ PASS' if success else '❌ FAIL',
-                'Duration': f'{duration}s',
-                'Output': output
-            })
+            results.append(self.test_runner.execute(test, env=self.network_env()))
 
             progress_bar.progress(idx / total_tests)
 
-        self.store_test_history(results)
+        self.store_test_history(results, started)
         self.display_results(results, results_container)
 
+        # Check screenshots automatically once baselines have been recorded
+        if (Path(self.test_runner.project_dir) / 'report' / 'baselines').exists():
+            self.run_visual_diff()
+
+    def run_visual_diff(self, update_baselines: bool = False):
+        from visual_diff import compare_project
+
+        with st.spinner("Comparing screenshots with baselines..."):
+            st.session_state.visual_results = compare_project(
+                self.test_runner.project_dir,
+                threshold=st.session_state.get('visual_threshold', 0.1),
+                update_baselines=update_baselines
+            )
+
+    def stop_watcher(self):
+        if st.session_state.watcher is not None:
+            st.session_state.watcher.stop()
+            st.session_state.watcher = None
+
+    def ensure_watcher(self):
+        """Start a watcher for the current index, replacing one that timed out"""
+        watcher = st.session_state.watcher
+        if watcher is None or not watcher.running:
+            from watcher import TestWatcher
+
+            # Sessions have no end hook: the watcher exits once the page stops polling it
+            watcher = TestWatcher(
+                st.session_state.test_index, st.session_state.watch_queue.put,
+                idle_timeout=WATCHER_IDLE_TIMEOUT
+            )
+            watcher.start()
+            st.session_state.watcher = watcher
+        watcher.touch()
+        return watcher
+
+    def render_watch_mode(self):
+        if st.session_state.test_index is None or self.test_runner is None:
+            return
+
+        watching = st.toggle(
+            "👀 Watch mode",
+            key="watch_mode",
+            help="Re-run tests automatically when their files or imported modules change"
+        )
+        if not watching:
+            self.stop_watcher()
+            return
+
+        watcher = self.ensure_watcher()
+        st.caption(
+            f"Watching {st.session_state.test_index.directory} "
+            f"({watcher.backend}) for changes..."
+        )
+        st.fragment(run_every=1.0)(self.run_watched_tests)()
+
+    def run_watched_tests(self):
+        """Run tests queued by the watcher since the last poll"""
+        self.ensure_watcher()
+        affected = {}
+        while not st.session_state.watch_queue.empty():
+            affected.update(dict.fromkeys(st.session_state.watch_queue.get_nowait()))
+
+        if affected:
+            # Pick up test files created since the last scan
+            index_files = sorted(st.session_state.test_index.files.values())
+            if index_files != sorted(set(st.session_state.test_files)):
+                st.session_state.test_files = index_files
+                st.session_state.test_commands = parse_test_commands(index_files)
+
+            started = datetime.now().timestamp()
+            results = []
+            for path in affected:
+                status = st.empty()
+                status.text(f"🔁 Re-running {path}")
+                results.append(self.test_runner.execute(str(path), env=self.network_env()))
+                status.empty()
+            self.store_test_history(results, started)
+            st.session_state.watch_results = results
+
+        results = st.session_state.get('watch_results')
+        if results:
+            passed = sum(1 for r in results if r['Status'] == '✅ PASS')
+            st.markdown(f"**Last watch run:** {passed}/{len(results)} passed")
+            for result in results:
+                with st.expander(f"{result['Status']} {result['Test']} ({result['Duration']})"):
+                    st.code(result['Output'])
+
+    def render_visual_regression(self):
+        if self.test_runner is None:
+            return
+        st.header("🖼️ Visual Regression")
+
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            st.slider(
+                "Colour tolerance",
+                min_value=0.0,
+                max_value=0.5,
+                value=0.1,
+                step=0.01,
+                key="visual_threshold",
+                help="Per-pixel colour distance ignored when comparing screenshots"
+            )
+        with col2:
+            if st.button("🔍 Compare Screenshots"):
+                self.run_visual_diff()
+        with col3:
+            if st.button("📌 Accept as Baselines"):
+                self.run_visual_diff(update_baselines=True)
+
+        results = st.session_state.visual_results
+        if results is None:
+            st.info("Screenshots in report/screenshots are compared with report/baselines after each run.")
+            return
+        if not results:
+            st.warning("No screenshots found in report/screenshots")
+            return
+
+        for result in results:
+            status = '✅ PASS' if result['passed'] else '❌ FAIL'
+            with st.expander(f"{status} {Path(result['image']).name} — {result['reason']}",
+                             expanded=not result['passed']):
+                if result['heatmap']:
+                    st.image(result['heatmap'], caption="Differences", use_column_width=True)
+                else:
+                    st.image(result['image'], caption="Screenshot", use_column_width=True)
+
     def display_results(self, results, container):
+        import pandas as pd
+
         with container:
             st.subheader("Test Results")
+            if self.test_runner is not None and self.test_runner.cache_stats['runs']:
+                stats = self.test_runner.cache_stats
+                st.caption(
+                    f"🗄️ Jest cache: {stats['new_entries']} new transform(s) over {stats['runs']} run(s) "
+                    f"({self.test_runner.cache_dir})"
+                )
             
             df = pd.DataFrame(results)
             st.dataframe(
@@ -381,7 +635,8 @@ class JestTestUI:
                 if st.button("📝 Generate Detailed Report"):
                     filepath = self.report_exporter.generate_summary_report(
                         results, 
-                        st.session_state.test_history
+                        st.session_state.test_history,
+                        self.artifact_store
                     )
                     st.success(f"Detailed report generated at: {filepath}")
 
@@ -398,7 +653,8 @@ class JestTestUI:
                 if st.button("📊 Export History as CSV"):
                     filepath = self.report_exporter.export_test_history(
                         st.session_state.test_history, 
-                        "csv"
+                        "csv",
+                        self.artifact_store
                     )
                     st.success(f"History exported to: {filepath}")
                     
@@ -406,10 +662,18 @@ class JestTestUI:
                 if st.button("📋 Export History as JSON"):
                     filepath = self.report_exporter.export_test_history(
                         st.session_state.test_history, 
-                        "json"
+                        "json",
+                        self.artifact_store
                     )
                     st.success(f"History exported to: {filepath}")
 
+            # Charts are opt-in so pandas and plotly load only when someone looks at them
+            if not st.toggle("📈 Show history charts", key="show_history_charts"):
+                return
+
+            import pandas as pd
+            import plotly.express as px
+
             history_df = pd.DataFrame(st.session_state.test_history)
             
             st.subheader("Test Success Rate Over Time")
@@ -455,6 +719,8 @@ class JestTestUI:
         self.render_directory_input()
         self.render_preset_management()
         self.render_test_selection()
+        self.render_watch_mode()
+        self.render_visual_regression()
         self.render_test_history()
 
 if __name__ == "__main__":
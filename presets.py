@@ -1,44 +1,176 @@
 import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_process_lock = threading.Lock()
 
 class PresetManager:
     def __init__(self, presets_file: str = "test_presets.json"):
         self.presets_file = Path(presets_file)
+        self.lock_file = self.presets_file.with_name(self.presets_file.name + ".lock")
+        self._cache: Optional[Dict[str, List[str]]] = None
+        self._cache_mtime: Optional[int] = None
         self._ensure_presets_file()
-    
+
     def _ensure_presets_file(self):
         """Create presets file if it doesn't exist"""
         if not self.presets_file.exists():
             self.save_presets({})
-    
-    def load_presets(self) -> Dict[str, List[str]]:
-        """Load saved test presets"""
+
+    @contextmanager
+    def _locked(self):
+        """Hold an exclusive lock on the presets file across threads and processes"""
+        with _process_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_file, 'a') as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return self.presets_file.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self) -> Dict[str, List[str]]:
+        """Read presets from disk, reusing the cached copy while the mtime is unchanged"""
+        mtime = self._mtime()
+        if self._cache is not None and mtime is not None and mtime == self._cache_mtime:
+            return self._cache
         try:
             with open(self.presets_file, 'r') as f:
-                return json.load(f)
+                presets = json.load(f)
         except (json.JSONDecodeError, FileNotFoundError):
-            return {}
-    
+            presets = {}
+        self._cache, self._cache_mtime = presets, mtime
+        return presets
+
+    def _file_mode(self) -> int:
+        """Permissions of the existing presets file, or the umask default for a new one"""
+        try:
+            return self.presets_file.stat().st_mode & 0o777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def _write(self, presets: Dict[str, List[str]]):
+        """Atomically replace the presets file (temp file + rename)"""
+        directory = self.presets_file.parent
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{self.presets_file.name}.", suffix=".tmp", dir=directory
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(presets, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates 0600 files; keep the mode a plain open() would give
+            os.chmod(tmp_path, self._file_mode())
+            os.replace(tmp_path, self.presets_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._cache, self._cache_mtime = dict(presets), self._mtime()
+
+    def load_presets(self) -> Dict[str, List[str]]:
+        """Load saved test presets"""
+        return {name: list(tests) for name, tests in self._read().items()}
+
     def save_presets(self, presets: Dict[str, List[str]]) -> bool:
         """Save test presets to file"""
         try:
-            with open(self.presets_file, 'w') as f:
-                json.dump(presets, f, indent=2)
+            with self._locked():
+                self._write(presets)
             return True
         except Exception:
             return False
-    
-    def add_preset(self, name: str, test_commands: List[str]) -> bool:
-        """Add a new preset"""
-        presets = self.load_presets()
-        presets[name] = test_commands
-        return self.save_presets(presets)
-    
+
+    def add_preset(self, name: str, test_commands: List[str], index=None) -> bool:
+        """
+        Add a new preset
+
+        Args:
+            name: Preset name
+            test_commands: File paths and -t name patterns
+            index: TestIndex of the current project; file paths inside it are
+                stored as project-relative file IDs so the preset stays portable
+        """
+        if index is not None:
+            test_commands = [self.to_entry(command, index) for command in test_commands]
+        try:
+            with self._locked():
+                presets = dict(self._read())
+                presets[name] = list(test_commands)
+                self._write(presets)
+            return True
+        except Exception:
+            return False
+
     def delete_preset(self, name: str) -> bool:
         """Delete a preset"""
-        presets = self.load_presets()
-        if name in presets:
-            del presets[name]
-            return self.save_presets(presets)
-        return False
+        try:
+            with self._locked():
+                presets = dict(self._read())
+                if name not in presets:
+                    return False
+                del presets[name]
+                self._write(presets)
+            return True
+        except Exception:
+            return False
+
+    def resolve_preset(self, name: str, index) -> Tuple[List[str], List[str]]:
+        """
+        Resolve a preset's entries against a discovery index
+
+        Args:
+            name: Preset name
+            index: TestIndex of the current project
+
+        Returns:
+            tuple: (runnable test patterns with files as project-relative IDs,
+                stale entries that match no discovered file or several of them)
+        """
+        resolved, stale = [], []
+        for entry in self.load_presets().get(name, []):
+            if entry.startswith("-t "):
+                resolved.append(entry)
+                continue
+            file_id = index.resolve(entry)
+            if file_id is None:
+                stale.append(entry)
+            else:
+                resolved.append(file_id)
+        return resolved, stale
+
+    @staticmethod
+    def to_entry(test_command: str, index) -> str:
+        """Convert a file path inside the indexed project to its file ID"""
+        if test_command.startswith("-t "):
+            return test_command
+        file_id = index.file_id(test_command)
+        return file_id if file_id in index.files else test_command
+
+    def find_stale_entries(self, index) -> Dict[str, List[str]]:
+        """Map each preset with unresolvable file entries to those entries"""
+        stale = {}
+        for name in self.load_presets():
+            _, missing = self.resolve_preset(name, index)
+            if missing:
+                stale[name] = missing
+        return stale
@@ -1,6 +1,17 @@
+// Offline replay runs the API tests against the local stub on localhost:3000;
+// live and record runs use the real app, which must already be running there.
+const replay = process.env.NETWORK_MODE === 'replay';
+
 module.exports = {
   launch: {
     headless: "new",
     defaultViewport: null,
   },
+  ...(replay && {
+    server: {
+      command: 'node support/stubServer.js',
+      port: 3000,
+      launchTimeout: 10000,
+    },
+  }),
 }
\ No newline at end of file
@@ -1,15 +1,27 @@
+const { attachNetworkCache } = require('../support/networkCache');
+
 class HomePage {
   constructor(page) {
     this.page = page;
     this.url = 'https://cannabot.pro';
+    this.networkCache = null;
   }
 
   async navigate() {
+    if (!this.networkCache) {
+      this.networkCache = await attachNetworkCache(this.page);
+    }
     await this.page.goto(this.url, {
       waitUntil: 'networkidle0'
     });
   }
 
+  async flushNetworkCache() {
+    if (this.networkCache) {
+      await this.networkCache.flush();
+    }
+  }
+
   async takeScreenshot(path) {
     await this.page.screenshot({
       path: path,
@@ -22,4 +34,4 @@ class HomePage {
   }
 }
 
-module.exports = HomePage; 
\ No newline at end of file
+module.exports = HomePage; 
@@ -24,6 +24,8 @@ describe('Cannabot.pro website', () => {
   });
 
   afterAll(async () => {
+    // Finish writing recorded responses before the page goes away
+    if (homePage) await homePage.flushNetworkCache();
     if (browser) {
       await browser.close();
     }
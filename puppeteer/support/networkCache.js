@@ -0,0 +1,146 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+// NETWORK_MODE=record saves every response to disk, NETWORK_MODE=replay serves
+// them back without touching the network. Anything else leaves the page alone.
+const MODE = process.env.NETWORK_MODE || 'off';
+const CACHE_DIR = process.env.NETWORK_CACHE_DIR || path.join(__dirname, '..', '.network-cache');
+const MEMORY_LIMIT = Number(process.env.NETWORK_CACHE_MEMORY_MB || 64) * 1024 * 1024;
+const FALLTHROUGH = process.env.NETWORK_REPLAY_FALLTHROUGH === '1';
+
+// Headers that describe the original transfer rather than the decoded body we store
+const DROPPED_HEADERS = new Set(['content-encoding', 'content-length', 'transfer-encoding']);
+
+function requestKey(method, url, postData) {
+  return crypto
+    .createHash('sha256')
+    .update(`${method} ${url}\n${postData || ''}`)
+    .digest('hex');
+}
+
+class LruCache {
+  constructor(limitBytes) {
+    this.limitBytes = limitBytes;
+    this.bytes = 0;
+    this.entries = new Map();
+  }
+
+  get(key) {
+    const entry = this.entries.get(key);
+    if (entry) {
+      // Re-insert to mark as most recently used
+      this.entries.delete(key);
+      this.entries.set(key, entry);
+    }
+    return entry;
+  }
+
+  set(key, entry) {
+    if (this.entries.has(key)) {
+      this.bytes -= this.entries.get(key).body.length;
+      this.entries.delete(key);
+    }
+    this.entries.set(key, entry);
+    this.bytes += entry.body.length;
+    for (const [oldestKey, oldest] of this.entries) {
+      if (this.bytes <= this.limitBytes) break;
+      this.entries.delete(oldestKey);
+      this.bytes -= oldest.body.length;
+    }
+  }
+}
+
+const memory = new LruCache(MEMORY_LIMIT);
+
+function entryPaths(key) {
+  const dir = path.join(CACHE_DIR, key.slice(0, 2));
+  return { dir, meta: path.join(dir, `${key}.json`), body: path.join(dir, `${key}.body`) };
+}
+
+async function saveEntry(request, response) {
+  const status = response.status();
+  // Redirect and empty responses carry no readable body
+  let body = Buffer.alloc(0);
+  if (status < 300 || status >= 400) {
+    try {
+      body = await response.buffer();
+    } catch {
+      return;
+    }
+  }
+
+  const key = requestKey(request.method(), request.url(), request.postData());
+  const paths = entryPaths(key);
+  const headers = Object.fromEntries(
+    Object.entries(response.headers()).filter(([name]) => !DROPPED_HEADERS.has(name.toLowerCase()))
+  );
+  // HAR-like entry; the body is stored next to it so large assets stay binary
+  const entry = {
+    startedDateTime: new Date().toISOString(),
+    request: { method: request.method(), url: request.url(), postData: request.postData() || null },
+    response: { status, headers, mimeType: headers['content-type'] || null, bodySize: body.length },
+  };
+
+  await fs.promises.mkdir(paths.dir, { recursive: true });
+  await fs.promises.writeFile(paths.body, body);
+  await fs.promises.writeFile(paths.meta, JSON.stringify(entry, null, 2));
+}
+
+async function loadEntry(key) {
+  const cached = memory.get(key);
+  if (cached) return cached;
+
+  const paths = entryPaths(key);
+  try {
+    const [meta, body] = await Promise.all([
+      fs.promises.readFile(paths.meta, 'utf8'),
+      fs.promises.readFile(paths.body),
+    ]);
+    const { response } = JSON.parse(meta);
+    const entry = { status: response.status, headers: response.headers, body };
+    memory.set(key, entry);
+    return entry;
+  } catch {
+    return null;
+  }
+}
+
+async function attachNetworkCache(page, mode = MODE) {
+  const stats = { mode, hits: 0, misses: 0, recorded: 0 };
+
+  if (mode === 'record') {
+    const pending = new Set();
+    page.on('response', (response) => {
+      const saving = saveEntry(response.request(), response)
+        .then(() => { stats.recorded += 1; })
+        .finally(() => pending.delete(saving));
+      pending.add(saving);
+    });
+    stats.flush = () => Promise.all(pending);
+  } else if (mode === 'replay') {
+    await page.setRequestInterception(true);
+    page.on('request', async (request) => {
+      if (request.isInterceptResolutionHandled()) return;
+      const entry = await loadEntry(requestKey(request.method(), request.url(), request.postData()));
+      if (entry) {
+        stats.hits += 1;
+        await request.respond({ status: entry.status, headers: entry.headers, body: entry.body });
+      } else {
+        stats.misses += 1;
+        if (FALLTHROUGH) {
+          await request.continue();
+        } else {
+          await request.abort('internetdisconnected');
+        }
+      }
+    });
+    stats.flush = () => Promise.resolve();
+  } else {
+    stats.flush = () => Promise.resolve();
+  }
+
+  return stats;
+}
+
+module.exports = { attachNetworkCache, loadEntry, requestKey, LruCache };
@@ -0,0 +1,64 @@
+const fs = require('fs');
+const http = require('http');
+const path = require('path');
+
+// Local stand-in for the app under test on localhost:3000, started by
+// jest-puppeteer for NETWORK_MODE=replay runs. /api/users is served from fixtures.
+const PORT = Number(process.env.PORT || 3000);
+const FIXTURES = path.join(__dirname, '..', 'fixtures');
+
+const USERS_PAGE = `<!DOCTYPE html>
+<html>
+  <head><title>Users</title></head>
+  <body>
+    <main id="app">Loading...</main>
+    <script>
+      const app = document.getElementById('app');
+      fetch('/api/users')
+        .then((response) => {
+          if (!response.ok) throw new Error(response.statusText);
+          return response.json();
+        })
+        .then((users) => {
+          const list = document.createElement('ul');
+          list.className = 'user-list';
+          for (const user of users) {
+            const card = document.createElement('li');
+            card.className = 'user-card';
+            const name = document.createElement('span');
+            name.className = 'user-name';
+            name.textContent = user.name;
+            card.appendChild(name);
+            list.appendChild(card);
+          }
+          app.replaceChildren(list);
+        })
+        .catch(() => {
+          const error = document.createElement('p');
+          error.className = 'error-message';
+          error.textContent = 'Failed to load users';
+          app.replaceChildren(error);
+        });
+    </script>
+  </body>
+</html>`;
+
+const server = http.createServer((req, res) => {
+  const { pathname } = new URL(req.url, `http://localhost:${PORT}`);
+  if (req.method === 'GET' && pathname === '/users') {
+    res.writeHead(200, { 'content-type': 'text/html; charset=utf-8' });
+    res.end(USERS_PAGE);
+  } else if (req.method === 'GET' && pathname === '/api/users') {
+    res.writeHead(200, { 'content-type': 'application/json' });
+    res.end(fs.readFileSync(path.join(FIXTURES, 'users.json')));
+  } else {
+    res.writeHead(404, { 'content-type': 'text/plain' });
+    res.end('Not found');
+  }
+});
+
+if (require.main === module) {
+  server.listen(PORT, () => console.log(`Stub server listening on http://localhost:${PORT}`));
+}
+
+module.exports = server;
@@ -1,7 +1,76 @@
 import json
-import pandas as pd
+import re
 from datetime import datetime
 from pathlib import Path
+from xml.etree import ElementTree as ET
+
+# ANSI escape sequences (chalk colours, cursor movement) emitted by Jest under CI
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]|\x1b[@-Z\\-_]')
+# Characters outside the XML 1.0 Char production
+XML_INVALID = re.compile('[^\u0009\u000a\u000d\u0020-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+def xml_safe(text: str) -> str:
+    """Strip ANSI sequences and characters that cannot appear in XML 1.0"""
+    return XML_INVALID.sub('', ANSI_ESCAPE.sub('', text or ''))
+
+def results_to_junit(results: list, suite_name: str = "jest") -> str:
+    """Render result rows as a JUnit XML document"""
+    failures = sum(1 for r in results if r['Status'] != '✅ PASS')
+    total_time = sum(float(r['Duration'].replace('s', '')) for r in results)
+
+    suite = ET.Element('testsuite', {
+        'name': suite_name,
+        'tests': str(len(results)),
+        'failures': str(failures),
+        'time': f"{total_time:.2f}",
+        'timestamp': datetime.now().isoformat(timespec='seconds')
+    })
+    for result in results:
+        case = ET.SubElement(suite, 'testcase', {
+            'name': xml_safe(result['Test']),
+            'classname': suite_name,
+            'time': result['Duration'].replace('s', '')
+        })
+        if result['Status'] != '✅ PASS':
+            failure = ET.SubElement(case, 'failure', {'message': 'Jest run failed'})
+            failure.text = xml_safe(result['Output'])
+        else:
+            ET.SubElement(case, 'system-out').text = xml_safe(result['Output'])
+
+    ET.indent(suite)
+    return ET.tostring(suite, encoding='unicode', xml_declaration=True)
+
+def resolve_history(history: list, artifact_store=None) -> list:
+    """
+    Replace artifact references in history rows with exportable values
+
+    Args:
+        history: History rows holding output_ref and screenshots references
+        artifact_store: ArtifactStore the references belong to
+
+    Returns:
+        list: Rows with the output text and screenshot file paths; artifacts
+            that have since been garbage-collected become None
+    """
+    if artifact_store is None:
+        return history
+    resolved = []
+    for entry in history:
+        entry = dict(entry)
+        ref = entry.pop('output_ref', None)
+        try:
+            entry['output'] = artifact_store.get_text(ref) if ref else None
+        except KeyError:
+            entry['output'] = None
+        screenshots = []
+        for screenshot in entry.get('screenshots', []):
+            try:
+                screenshots.append(str(artifact_store.path(screenshot)))
+            except KeyError:
+                continue
+        entry['screenshots'] = screenshots
+        resolved.append(entry)
+    return resolved
 
 class TestReportExporter:
     def __init__(self):
@@ -24,17 +93,22 @@ class TestReportExporter:
         if format == "json":
             with open(filepath, 'w') as f:
                 json.dump(results, f, indent=2, default=str)
+        elif format == "xml":
+            with open(filepath, 'w') as f:
+                f.write(results_to_junit(results))
         elif format == "csv":
+            import pandas as pd
             df = pd.DataFrame(results)
             df.to_csv(filepath, index=False)
             
         return str(filepath)
         
-    def export_test_history(self, history: list, format: str = "json") -> str:
-        """Export test history to specified format"""
+    def export_test_history(self, history: list, format: str = "json", artifact_store=None) -> str:
+        """Export test history to specified format, resolving artifact references"""
         if not history:
             return None
-            
+        history = resolve_history(history, artifact_store)
+
         filename = self.generate_filename("test_history", format)
         filepath = self.reports_dir / filename
         
@@ -42,16 +116,21 @@ class TestReportExporter:
             with open(filepath, 'w') as f:
                 json.dump(history, f, indent=2, default=str)
         elif format == "csv":
+            import pandas as pd
             df = pd.DataFrame(history)
             df.to_csv(filepath, index=False)
             
         return str(filepath)
         
-    def generate_summary_report(self, results: list, history: list) -> str:
+    def generate_summary_report(self, results: list, history: list, artifact_store=None) -> str:
         """Generate a detailed summary report in Markdown format"""
         if not results or not history:
             return None
             
+        import pandas as pd
+
+        history = resolve_history(history, artifact_store)
+
         filename = self.generate_filename("test_summary", "md")
         filepath = self.reports_dir / filename
         
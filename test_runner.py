@@ -1,15 +1,58 @@
+import hashlib
+import json
+import os
+import shlex
 import subprocess
 from pathlib import Path
-import re
-import streamlit as st
-import json
-import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from concurrency import ConcurrencyController
+from utils import TestIndex
+
+PREWARM_SCRIPT = Path(__file__).with_name('jest_prewarm.js')
+
+# Modules that go through Jest's transformer (JSON is loaded without one)
+TRANSFORMED_SUFFIXES = ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs')
+
+# Event handlers receive an event kind and a message. Kinds are
+# "info", "success", "error", "stdout", "stderr" and "concurrency"
+# (adaptive concurrency decisions).
+EventHandler = Callable[[str, str], None]
+
+def is_name_pattern_entry(test_pattern: str) -> bool:
+    """Whether a pattern is a Jest test name filter of the form -t '<name>'"""
+    return len(test_pattern) > 5 and test_pattern.startswith("-t '") and test_pattern.endswith("'")
+
+def build_result(test_pattern: str, success: bool, output: str, duration: float) -> dict:
+    """Build a result row in the format shared by the UI, CLI and exporters"""
+    return {
+        'Test': test_pattern,
+        'Status': '✅ PASS' if success else '❌ FAIL',
+        'Duration': f'{duration}s',
+        'Output': output
+    }
 
 class TestRunner:
-    def __init__(self, project_dir: str = None):
+    def __init__(self, project_dir: str = None, on_event: Optional[EventHandler] = None):
         self.npm_command = 'npm'
+        self.timeout = 300
+        # Extra environment variables for every Jest process (e.g. NETWORK_MODE)
+        self.env: dict[str, str] = {}
+        self.on_event = on_event
         self.project_dir = self._validate_project_dir(project_dir or str(Path.cwd()))
         self._ensure_configs()
+        self.cache_dir = self._jest_cache_dir()
+        self.cache_stats = {'runs': 0, 'new_entries': 0}
+        # directory -> (mtime_ns, transform results, subdirectories)
+        self._cache_dir_counts: dict[str, tuple[int, int, list[str]]] = {}
+        self._module_index = TestIndex(self.project_dir)
+
+    def _emit(self, kind: str, message: str):
+        """Forward a runner event to the registered handler, if any"""
+        if self.on_event is not None:
+            self.on_event(kind, message)
     
     def _validate_project_dir(self, directory: str) -> str:
         """Validate the project directory exists and contains package.json"""
@@ -64,73 +107,197 @@ module.exports = {
         if not puppeteer_config_path.exists():
             with open(puppeteer_config_path, 'w') as f:
                 f.write(puppeteer_config.strip())
-            st.success("Created jest-puppeteer.config.js")
+            self._emit("success", "Created jest-puppeteer.config.js")
 
         # Write Jest config
         jest_config_path = Path(self.project_dir) / 'jest.config.js'
         if not jest_config_path.exists():
             with open(jest_config_path, 'w') as f:
                 f.write(jest_config.strip())
-            st.success("Created jest.config.js")
+            self._emit("success", "Created jest.config.js")
+
+    def _jest_cache_dir(self) -> Path:
+        """Persistent Jest cacheDirectory for this project and its current config"""
+        digest = hashlib.sha256(str(Path(self.project_dir).resolve()).encode())
+        for name in ('package.json', 'package-lock.json', 'jest.config.js', 'babel.config.js', 'tsconfig.json'):
+            config_path = Path(self.project_dir) / name
+            if config_path.exists():
+                digest.update(name.encode() + b'\0' + config_path.read_bytes())
+        cache_root = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache'))
+        return cache_root / 'puppetui' / 'jest' / digest.hexdigest()[:16]
+
+    def _count_cache_entries(self) -> int:
+        """
+        Number of transform results in the Jest cache (source maps excluded)
+
+        Per-directory counts are kept between calls and a directory is only
+        listed again when its mtime changes, so each call costs one stat per
+        cache directory rather than a walk of every cached file.
+        """
+        counts = {}
+        pending = []
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                pending = [e.path for e in entries if e.name.startswith('jest-transform-cache-') and e.is_dir()]
+        except OSError:
+            pass
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._cache_dir_counts.get(directory)
+            if cached is None or cached[0] != mtime:
+                files, subdirs = 0, []
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir():
+                                subdirs.append(entry.path)
+                            elif not entry.name.endswith('.map'):
+                                files += 1
+                except OSError:
+                    continue
+                cached = (mtime, files, subdirs)
+            counts[directory] = cached
+            pending.extend(cached[2])
+        self._cache_dir_counts = counts
+        return sum(files for _, files, _ in counts.values())
+
+    def _transformed_modules(self, test_file) -> list[str]:
+        """IDs of a test file and the project modules it imports that Jest transforms"""
+        return [m for m in self._module_index.modules_for(test_file) if m.endswith(TRANSFORMED_SUFFIXES)]
+
+    def _record_cache_usage(self, entries_before: int):
+        """
+        Count the transform cache entries a run added
+
+        Only new entries are measured: Jest does not report cache reads, so a
+        run that adds none had every module it transformed already cached.
+        With parallel workers sharing the cache, entries written by one run
+        can be counted against another that finished at the same time.
+        """
+        new_entries = max(0, self._count_cache_entries() - entries_before)
+        self.cache_stats['runs'] += 1
+        self.cache_stats['new_entries'] += new_entries
+        self._emit("info", f"🗄️ Jest cache: {new_entries} new transform(s)")
+
+    def prewarm_cache(self, test_files: list[Path]) -> Optional[dict]:
+        """
+        Transform test files and their imports into the shared Jest cache
+
+        Args:
+            test_files: Discovered test files
 
-    def run_test(self, test_pattern: str) -> tuple[bool, str]:
+        Returns:
+            dict: Summary with files, new_entries and errors, or None if Jest is unavailable
+        """
+        if not (Path(self.project_dir) / 'node_modules' / 'jest-config').exists():
+            return None
+
+        modules = {}
+        for test_file in test_files:
+            modules.update(dict.fromkeys(self._transformed_modules(test_file)))
+        if not modules:
+            return None
+
+        jest_config = Path(self.project_dir) / 'jest.config.js'
+        cmd = ['node', str(PREWARM_SCRIPT), str(self.cache_dir),
+               str(jest_config) if jest_config.exists() else '-', *modules]
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            # Same environment as test runs, e.g. NODE_OPTIONS affects the transform options
+            process = subprocess.run(
+                cmd, capture_output=True, text=True, cwd=str(self.project_dir),
+                timeout=self.timeout, env={**os.environ, **self.env}
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self._emit("error", f"⚠️ Jest cache pre-warm failed: {e}")
+            return None
+        if process.returncode != 0:
+            self._emit("error", f"⚠️ Jest cache pre-warm failed: {process.stderr.strip()}")
+            return None
+
+        summary = json.loads(process.stdout)
+        if summary['files']:
+            self._emit("success", (
+                f"🔥 Pre-warmed Jest cache with {summary['files']} module(s): "
+                f"{summary['new_entries']} new transform(s)"
+            ))
+        for error in summary['errors']:
+            self._emit("error", f"⚠️ Could not transform {error}")
+        return summary
+
+    def run_test(self, test_pattern: str,
+                 controller: Optional[ConcurrencyController] = None,
+                 env: Optional[dict[str, str]] = None) -> tuple[bool, str]:
         """Execute a Jest test command and return the results"""
         try:
             # Get the test file path
+            # Test name patterns are matched by Jest itself and need no file
+            is_name_pattern = is_name_pattern_entry(test_pattern)
             test_path = None
-            if test_pattern.endswith('.test.js'):
-                # If it's a direct file path
-                test_path = Path(test_pattern)
-            else:
-                # If it's a test name pattern, find the containing file
-                for root, _, files in Path(self.project_dir).glob('**/*.test.js'):
-                    for file in files:
-                        full_path = root / file
-                        if test_pattern in full_path.read_text():
+            if not is_name_pattern:
+                candidate = Path(test_pattern)
+                if not candidate.is_absolute():
+                    # Relative paths and file IDs are relative to the project
+                    candidate = Path(self.project_dir) / candidate
+                if candidate.is_file():
+                    # If it's a direct file path
+                    test_path = candidate
+                else:
+                    # Otherwise find a test file containing the pattern
+                    for full_path in Path(self.project_dir).glob('**/*.test.js'):
+                        if 'node_modules' not in full_path.parts and test_pattern in full_path.read_text():
                             test_path = full_path
                             break
-                    if test_path:
-                        break
 
-            if not test_path:
-                return False, f"Could not locate test file for pattern: {test_pattern}"
+                if not test_path:
+                    return False, f"Could not locate test file for pattern: {test_pattern}"
 
-            # Ensure we're using absolute paths
-            test_path = test_path.resolve()
-            
-            # Build the command
-            if test_pattern.startswith("-t '"):
+            # Build the command, sharing one transform cache across runs and workers.
+            # The directory is re-derived so config edits get a fresh cache.
+            self.cache_dir = self._jest_cache_dir()
+            cache_entries = self._count_cache_entries()
+            # Patterns may come from remote coordinators, so they are passed as
+            # argv entries and never interpreted by a shell
+            cache_arg = f"--cacheDirectory={self.cache_dir}"
+            if is_name_pattern:
                 # For test name patterns
                 test_name = test_pattern[4:-1]  # Remove "-t '" prefix and trailing "'"
-                cmd = f"{self.npm_command} test -- -t \"{test_name}\""
+                argv = [self.npm_command, 'test', '--', '-t', test_name, cache_arg]
             else:
+                # Ensure we're using absolute paths
+                test_path = test_path.resolve()
                 # For file paths, use relative path from project directory
-                relative_path = test_path.relative_to(Path(self.project_dir))
-                cmd = f"{self.npm_command} test {relative_path}"
+                relative_path = test_path.relative_to(Path(self.project_dir).resolve())
+                argv = [self.npm_command, 'test', '--', relative_path.as_posix(), cache_arg]
+            cmd = shlex.join(argv)
             
             # Log execution details
-            st.write(f"🔧 Executing command: `{cmd}`")
-            st.write(f"📂 Working directory: {self.project_dir}")
+            self._emit("info", f"🔧 Executing command: `{cmd}`")
+            self._emit("info", f"📂 Working directory: {self.project_dir}")
             
             # Execute the command from the project directory
             process = subprocess.Popen(
-                cmd,
-                shell=True,
+                argv,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
-                cwd=str(self.project_dir)
+                cwd=str(self.project_dir),
+                env={**os.environ, **self.env, **(env or {})}
             )
+            if controller is not None:
+                controller.track(process.pid)
             
             try:
-                output, error = process.communicate(timeout=300)
+                output, error = process.communicate(timeout=self.timeout)
                 
                 if output:
-                    st.write("📤 Raw output:")
-                    st.code(output, language="bash")
+                    self._emit("stdout", output)
                 if error:
-                    st.write("⚠️ Error output:")
-                    st.code(error, language="bash")
+                    self._emit("stderr", error)
                 
                 full_output = f"Command: {cmd}\nWorking Directory: {self.project_dir}\n\n"
                 if output:
@@ -138,17 +305,76 @@ module.exports = {
                 if error:
                     full_output += f"Errors:\n{error}\n"
                 
+                self._record_cache_usage(cache_entries)
                 success = process.returncode == 0
                 return success, full_output
                 
             except subprocess.TimeoutExpired:
                 process.kill()
-                st.error("⏰ Test execution timed out after 5 minutes")
-                return False, "Error: Test execution timed out after 5 minutes"
+                process.communicate()
+                message = f"Test execution timed out after {self.timeout} seconds"
+                self._emit("error", f"⏰ {message}")
+                return False, f"Error: {message}"
+            finally:
+                if controller is not None:
+                    controller.untrack(process.pid)
             
         except Exception as e:
             error_msg = f"Error executing test: {str(e)}\n"
             error_msg += f"Command attempted: {test_pattern}\n"
             error_msg += f"Working directory: {self.project_dir}\n"
-            st.error(f"⚠️ {error_msg}")
+            self._emit("error", f"⚠️ {error_msg}")
             return False, error_msg
+
+    def execute(self, test_pattern: str,
+                controller: Optional[ConcurrencyController] = None,
+                env: Optional[dict[str, str]] = None) -> dict:
+        """Run a single test pattern and return its result row"""
+        start_time = time.time()
+        success, output = self.run_test(test_pattern, controller, env)
+        duration = round(time.time() - start_time, 2)
+        return build_result(test_pattern, success, output, duration)
+
+    def run_tests(self, test_patterns: list[str], max_workers: int = 1,
+                  on_result: Optional[Callable[[dict], None]] = None,
+                  adaptive: bool = False) -> list[dict]:
+        """
+        Run several test patterns, optionally in parallel
+
+        Args:
+            test_patterns: Patterns to run
+            max_workers: Number of concurrent Jest processes (upper bound when adaptive)
+            on_result: Called with each result row as soon as it completes
+            adaptive: Scale concurrency with CPU and memory pressure
+
+        Returns:
+            list: Result rows in the order of test_patterns
+        """
+        controller = None
+        if adaptive and max_workers > 1:
+            controller = ConcurrencyController(
+                max_workers, on_decision=lambda message: self._emit("concurrency", message)
+            )
+
+        def run_one(pattern: str) -> dict:
+            if controller is None:
+                result = self.execute(pattern)
+            else:
+                # The timeout only starts once a slot is granted
+                with controller.slot():
+                    result = self.execute(pattern, controller)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        if max_workers <= 1:
+            return [run_one(pattern) for pattern in test_patterns]
+
+        if controller is not None:
+            controller.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(run_one, test_patterns))
+        finally:
+            if controller is not None:
+                controller.stop()
@@ -0,0 +1,67 @@
+import json
+import os
+
+from artifacts import REF_PREFIX, ArtifactStore
+
+def index_on_disk(store):
+    with open(store.index_file) as f:
+        return json.load(f)
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put_text("same output")
+    second = store.put_text("same output")
+    other = store.put_text("other output")
+    store.flush()
+
+    assert first == second != other
+    assert store.stats()['objects'] == 2
+    assert store._index[store.digest(first)]['refs'] == 2
+    assert store.get_text(first) == "same output"
+
+def test_released_objects_are_collected_only_without_references(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    ref = store.put_text("log line\n" * 100)
+    store.add_ref(ref)
+    store.flush()
+    path = store.path(ref)
+
+    store.release(ref)
+    assert store.gc() == 0
+    assert path.exists()
+
+    store.release(ref)
+    assert store.gc() > 0
+    assert not path.exists()
+    assert store.stats()['objects'] == 0
+    assert index_on_disk(store) == {}
+
+def test_gc_drops_objects_past_retention(tmp_path):
+    store = ArtifactStore(str(tmp_path), retention_days=1)
+    ref = store.put_bytes(b"old")
+    store._index[store.digest(ref)]['last_used'] -= 2 * 86400
+    store.gc()
+    assert store.stats()['objects'] == 0
+
+def test_batch_writes_the_index_once(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path))
+    writes = []
+    write_index = store._write_index
+    monkeypatch.setattr(store, "_write_index", lambda: writes.append(1) or write_index())
+
+    with store.batch():
+        refs = [store.put_bytes(f"row {i}".encode()) for i in range(5)]
+        for ref in refs:
+            store.add_ref(ref)
+            store.release(ref)
+        assert writes == []
+        assert not os.path.exists(store.index_file)
+
+    assert writes == [1]
+    assert {REF_PREFIX + digest for digest in index_on_disk(store)} == set(refs)
+
+def test_index_survives_a_restart(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    ref = store.put_text("persisted")
+    store.flush()
+    assert ArtifactStore(str(tmp_path)).get_text(ref) == "persisted"
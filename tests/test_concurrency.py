@@ -0,0 +1,62 @@
+import pytest
+
+from concurrency import ConcurrencyController
+
+GiB = 2**30
+
+def sample(cpu_busy=0.5, cpu_pressure=0.0, mem_available=8 * GiB, avg_rss=200 * 2**20, active=2):
+    return {'cpu_busy': cpu_busy, 'cpu_pressure': cpu_pressure, 'mem_available': mem_available,
+            'avg_rss': avg_rss, 'active': active}
+
+@pytest.fixture
+def controller():
+    controller = ConcurrencyController(max_workers=4, min_workers=1, cooldown=10)
+    controller.limit = 2
+    controller._last_change = 0.0
+    return controller
+
+def test_grows_by_one_when_saturated_with_headroom(controller):
+    limit, reason = controller.decide(sample(active=2), now=100)
+    assert limit == 3
+    assert reason.startswith("headroom")
+
+def test_does_not_grow_with_free_slots(controller):
+    # Idle slots mean more concurrency would not be used
+    assert controller.decide(sample(active=1), now=100) == (2, "steady")
+
+@pytest.mark.parametrize("overrides", [
+    {'cpu_busy': 0.9},
+    {'cpu_pressure': 0.2},
+    {'mem_available': 700 * 2**20},
+])
+def test_does_not_grow_without_headroom(controller, overrides):
+    assert controller.decide(sample(**overrides), now=100) == (2, "steady")
+
+def test_never_grows_past_max_workers(controller):
+    controller.limit = 4
+    assert controller.decide(sample(active=4), now=100)[0] == 4
+
+def test_cooldown_blocks_changes(controller):
+    controller._last_change = 95
+    assert controller.decide(sample(mem_available=100 * 2**20), now=100) == (2, "cooling down")
+    assert controller.decide(sample(active=2), now=100) == (2, "cooling down")
+    # Once the cooldown has passed the same sample is acted on
+    assert controller.decide(sample(active=2), now=106)[0] == 3
+
+def test_low_memory_shrinks(controller):
+    limit, reason = controller.decide(sample(mem_available=256 * 2**20), now=100)
+    assert limit == 1
+    assert reason.startswith("low memory (256 MiB")
+
+def test_cpu_contention_shrinks(controller):
+    limit, reason = controller.decide(sample(cpu_pressure=0.5, cpu_busy=1.0), now=100)
+    assert limit == 1
+    assert reason.startswith("CPU contention (50% stalled")
+
+def test_never_shrinks_below_min_workers(controller):
+    controller.limit = 1
+    assert controller.decide(sample(cpu_pressure=0.9), now=100)[0] == 1
+
+def test_missing_metrics(controller):
+    assert controller.decide(sample(cpu_pressure=None), now=100) == (4, "no /proc metrics, using max workers")
+    assert controller.decide(sample(cpu_busy=None), now=100) == (2, "warming up")
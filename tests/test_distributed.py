@@ -0,0 +1,151 @@
+import os
+import stat
+import threading
+import time
+import urllib.error
+
+import pytest
+
+import test_runner
+from distributed import Coordinator, Worker
+from test_runner import build_result
+
+PATTERNS = [f"tests/{i}.test.js" for i in range(6)]
+
+@pytest.fixture(autouse=True)
+def project(tmp_path, monkeypatch):
+    """A checkout containing the test files the coordinator hands out"""
+    for pattern in PATTERNS + ["a.test.js"]:
+        path = tmp_path / pattern
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    (tmp_path / "package.json").write_text("{}")
+    monkeypatch.setattr(StubRunner, "project_dir", str(tmp_path))
+    return tmp_path
+
+class StubRunner:
+    """Stands in for TestRunner; optionally blocks until released"""
+    project_dir = "."
+
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+        self.started = threading.Event()
+        self.patterns = []
+
+    def run_tests(self, test_patterns, max_workers=1, on_result=None, adaptive=False):
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(10)
+        self.patterns.extend(test_patterns)
+        return [build_result(pattern, True, f"ran {pattern}", 0.01) for pattern in test_patterns]
+
+def start_worker(url: str, runner: StubRunner, name: str, token: str = None):
+    worker = Worker(url, runner, name=name, token=token)
+    worker.register(retry_for=5)
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(completed=worker.run()), daemon=True)
+    thread.start()
+    return thread, outcome
+
+def test_two_workers_share_the_queue():
+    patterns = PATTERNS
+    coordinator = Coordinator(patterns, batch_size=2)
+    host, port = coordinator.serve("127.0.0.1", 0)
+    url = f"http://{host}:{port}"
+    try:
+        runners = [StubRunner(), StubRunner()]
+        workers = [start_worker(url, runner, f"node{i}") for i, runner in enumerate(runners)]
+        assert coordinator.wait(10)
+        for thread, _ in workers:
+            thread.join(10)
+    finally:
+        coordinator.shutdown()
+
+    results = coordinator.results()
+    assert [r['Test'] for r in results] == patterns
+    assert {r['Worker'] for r in results} <= {"node0", "node1"}
+    assert sum(outcome['completed'] for _, outcome in workers) == len(patterns)
+    assert sorted(runners[0].patterns + runners[1].patterns) == sorted(patterns)
+
+def test_expired_lease_is_requeued_and_late_results_rejected():
+    coordinator = Coordinator(["a.test.js"], lease_timeout=0.1)
+    slow = coordinator.register("slow")['worker_id']
+    fast = coordinator.register("fast")['worker_id']
+
+    first = coordinator.lease(slow)
+    assert first['tests'] == ["a.test.js"]
+    assert 'wait' in coordinator.lease(fast)
+
+    time.sleep(0.2)
+    second = coordinator.lease(fast)
+    assert second['tests'] == ["a.test.js"]
+    assert coordinator.complete(fast, second['batch_id'], [build_result("a.test.js", True, "", 0.1)]) == {'accepted': True}
+    assert coordinator.complete(slow, first['batch_id'], [build_result("a.test.js", False, "", 9.9)]) == {'accepted': False}
+    assert coordinator.lease(slow) == {'done': True}
+    assert coordinator.results()[0]['Worker'] == "fast"
+
+def test_slow_worker_exits_cleanly_after_coordinator_shutdown():
+    coordinator = Coordinator(["a.test.js"], lease_timeout=0.2)
+    host, port = coordinator.serve("127.0.0.1", 0)
+    url = f"http://{host}:{port}"
+    release = threading.Event()
+    slow_runner = StubRunner(release)
+    try:
+        slow_thread, slow_outcome = start_worker(url, slow_runner, "slow")
+        assert slow_runner.started.wait(5)
+        # The fast worker picks the batch up once the slow worker's lease expires
+        fast_thread, fast_outcome = start_worker(url, StubRunner(), "fast")
+        assert coordinator.wait(10)
+        fast_thread.join(10)
+    finally:
+        coordinator.shutdown()
+
+    release.set()
+    slow_thread.join(10)
+    assert not slow_thread.is_alive()
+    assert slow_outcome['completed'] == 0
+    assert fast_outcome['completed'] == 1
+    assert coordinator.results()[0]['Worker'] == "fast"
+
+def test_token_is_required_when_set():
+    coordinator = Coordinator(["a.test.js"], token="s3cret")
+    host, port = coordinator.serve("127.0.0.1", 0)
+    url = f"http://{host}:{port}"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            Worker(url, StubRunner(), token="wrong").register(retry_for=1)
+        assert error.value.code == 403
+        thread, outcome = start_worker(url, StubRunner(), "trusted", token="s3cret")
+        assert coordinator.wait(10)
+        thread.join(10)
+    finally:
+        coordinator.shutdown()
+    assert outcome['completed'] == 1
+
+def test_worker_rejects_entries_that_are_not_indexed_files_or_name_filters():
+    runner = StubRunner()
+    worker = Worker("http://unused", runner)
+    worker.index.scan()
+    entries = ["a.test.js", "-t 'login works'", "a.test.js; rm -rf /", "../outside.test.js",
+               "-t 'unterminated"]
+    rows = worker.run_batch(entries)
+    assert runner.patterns == ["a.test.js", "-t 'login works'"]
+    assert [r['Test'] for r in rows] == entries
+    assert [r['Status'] for r in rows] == ['✅ PASS'] * 2 + ['❌ FAIL'] * 3
+    assert "Rejected leased entry" in rows[2]['Output']
+
+def test_name_filters_are_passed_as_arguments_not_shell(project, tmp_path_factory):
+    # A fake npm that records its arguments one per line
+    bin_dir = tmp_path_factory.mktemp("bin")
+    npm = bin_dir / "npm"
+    npm.write_text('#!/bin/sh\nfor arg in "$@"; do echo "$arg"; done > "$(dirname "$0")/args"\n')
+    npm.chmod(npm.stat().st_mode | stat.S_IEXEC)
+    marker = project / "pwned"
+
+    runner = test_runner.TestRunner(str(project))
+    runner.npm_command = str(npm)
+    success, _ = runner.run_test(f"-t 'a\"; touch {marker}; echo \"'")
+    assert success
+    assert not marker.exists()
+    args = (bin_dir / "args").read_text().splitlines()
+    assert args[:4] == ["test", "--", "-t", f'a"; touch {marker}; echo "']
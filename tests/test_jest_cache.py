@@ -0,0 +1,46 @@
+"""
+End-to-end check that a pre-warmed cache is what Jest reads
+
+Needs Node and an installed Jest (run `npm install` in puppeteer/ first, or
+point PUPPETUI_JEST_NODE_MODULES at another node_modules directory).
+"""
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+import test_runner
+
+NODE_MODULES = Path(os.environ.get(
+    "PUPPETUI_JEST_NODE_MODULES", Path(__file__).resolve().parent.parent / "puppeteer" / "node_modules"
+))
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("node") is None or shutil.which("npm") is None
+    or not (NODE_MODULES / "jest").exists() or not (NODE_MODULES / "jest-config").exists(),
+    reason="Node and an installed Jest are required"
+)
+
+def test_prewarmed_run_writes_no_new_transforms(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    project = tmp_path / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "node_modules").symlink_to(NODE_MODULES)
+    (project / "package.json").write_text('{"name": "prewarm-check", "scripts": {"test": "jest"}}')
+    (project / "jest.config.js").write_text("module.exports = { testEnvironment: 'node' };\n")
+    (project / "jest-puppeteer.config.js").write_text("module.exports = {};\n")
+    (project / "src" / "sum.js").write_text("module.exports = (a, b) => a + b;\n")
+    (project / "sum.test.js").write_text(
+        "const sum = require('./src/sum');\n"
+        "test('adds', () => { expect(sum(1, 2)).toBe(3); });\n"
+    )
+
+    runner = test_runner.TestRunner(str(project))
+    summary = runner.prewarm_cache([project / "sum.test.js"])
+    assert summary is not None and not summary['errors']
+    assert summary['files'] == 2 and summary['new_entries'] == 2
+
+    success, output = runner.run_test("sum.test.js")
+    assert success, output
+    assert runner.cache_stats == {'runs': 1, 'new_entries': 0}
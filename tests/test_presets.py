@@ -0,0 +1,88 @@
+import json
+import os
+import stat
+import threading
+
+from presets import PresetManager
+import utils
+
+def make_project(root, files):
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    index = utils.TestIndex(str(root), ['node_modules'])
+    index.scan()
+    return index
+
+def test_save_keeps_file_mode_and_leaves_no_temp_files(tmp_path):
+    presets_file = tmp_path / "presets.json"
+    presets_file.write_text("{}")
+    os.chmod(presets_file, 0o644)
+    manager = PresetManager(str(presets_file))
+
+    assert manager.add_preset("smoke", ["a.test.js"])
+    assert stat.S_IMODE(presets_file.stat().st_mode) == 0o644
+    assert json.loads(presets_file.read_text()) == {"smoke": ["a.test.js"]}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["presets.json", "presets.json.lock"]
+
+def test_new_file_uses_umask_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        PresetManager(str(tmp_path / "presets.json"))
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((tmp_path / "presets.json").stat().st_mode) == 0o644
+
+def test_concurrent_adds_from_several_managers_are_all_kept(tmp_path):
+    presets_file = str(tmp_path / "presets.json")
+    PresetManager(presets_file)
+
+    def add(i):
+        assert PresetManager(presets_file).add_preset(f"p{i}", [f"{i}.test.js"])
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(PresetManager(presets_file).load_presets()) == sorted(f"p{i}" for i in range(20))
+
+def test_cache_is_refreshed_when_another_writer_changes_the_file(tmp_path):
+    presets_file = tmp_path / "presets.json"
+    reader, writer = PresetManager(str(presets_file)), PresetManager(str(presets_file))
+    assert reader.load_presets() == {}
+
+    writer.add_preset("smoke", ["a.test.js"])
+    # Force a different mtime even on coarse-grained filesystems
+    os.utime(presets_file, ns=(0, presets_file.stat().st_mtime_ns + 10**9))
+    assert reader.load_presets() == {"smoke": ["a.test.js"]}
+
+def test_load_returns_copies(tmp_path):
+    manager = PresetManager(str(tmp_path / "presets.json"))
+    manager.add_preset("smoke", ["a.test.js"])
+    manager.load_presets()["smoke"].append("b.test.js")
+    assert manager.load_presets() == {"smoke": ["a.test.js"]}
+
+def test_presets_are_saved_as_file_ids(tmp_path):
+    index = make_project(tmp_path / "project", ["api.test.js", "pages/home.test.js"])
+    manager = PresetManager(str(tmp_path / "presets.json"))
+    manager.add_preset("all", [str(index.files["pages/home.test.js"]), "-t 'login'"], index)
+    assert manager.load_presets() == {"all": ["pages/home.test.js", "-t 'login'"]}
+    assert manager.resolve_preset("all", index) == (["pages/home.test.js", "-t 'login'"], [])
+
+def test_resolve_matches_paths_from_another_checkout(tmp_path):
+    index = make_project(tmp_path / "project", ["api.test.js", "pages/home.test.js"])
+    assert index.resolve("/Users/someone/work/project/pages/home.test.js") == "pages/home.test.js"
+    assert index.resolve("/Users/someone/work/project/api.test.js") == "api.test.js"
+    assert index.resolve("/Users/someone/work/project/gone.test.js") is None
+
+def test_resolve_reports_ambiguous_suffixes_as_unresolved(tmp_path):
+    index = make_project(tmp_path / "project", ["a/x.test.js", "b/x.test.js", "y.test.js"])
+    assert index.resolve("/elsewhere/x.test.js") is None
+    assert index.resolve("/elsewhere/project/b/x.test.js") == "b/x.test.js"
+
+    manager = PresetManager(str(tmp_path / "presets.json"))
+    manager.add_preset("old", ["/elsewhere/x.test.js", "/elsewhere/y.test.js"])
+    assert manager.resolve_preset("old", index) == (["y.test.js"], ["/elsewhere/x.test.js"])
+    assert manager.find_stale_entries(index) == {"old": ["/elsewhere/x.test.js"]}
@@ -0,0 +1,70 @@
+import utils
+
+def write(root, name, content=""):
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+def make_index(root):
+    write(root, "src/format.js", "module.exports = (s) => s.trim();\n")
+    write(root, "src/cart.js", "const format = require('./format');\n")
+    write(root, "src/checkout/index.js", "import cart from '../cart';\n")
+    write(root, "tests/cart.test.js", "const cart = require('../src/cart');\n")
+    write(root, "tests/checkout.test.js", "import checkout from '../src/checkout';\n")
+    write(root, "tests/plain.test.js", "test('ok', () => {});\n")
+    write(root, "node_modules/lib/index.js", "")
+    index = utils.TestIndex(str(root), ['node_modules'])
+    index.scan()
+    return index
+
+def test_dependency_closure_follows_imports_transitively(tmp_path):
+    index = make_index(tmp_path)
+    assert index.dependency_closure("tests/checkout.test.js") == {
+        "src/checkout/index.js", "src/cart.js", "src/format.js"
+    }
+    assert index.dependency_closure("tests/cart.test.js") == {"src/cart.js", "src/format.js"}
+    assert index.dependency_closure("tests/plain.test.js") == set()
+
+def test_dependency_closure_handles_cycles(tmp_path):
+    write(tmp_path, "a.js", "require('./b');\n")
+    write(tmp_path, "b.js", "require('./a');\n")
+    write(tmp_path, "cycle.test.js", "require('./a');\n")
+    index = utils.TestIndex(str(tmp_path))
+    index.scan()
+    assert index.dependency_closure("cycle.test.js") == {"a.js", "b.js"}
+
+def test_affected_tests_includes_dependents(tmp_path):
+    index = make_index(tmp_path)
+    assert index.affected_tests({"src/format.js"}) == ["tests/cart.test.js", "tests/checkout.test.js"]
+    assert index.affected_tests({"src/checkout/index.js"}) == ["tests/checkout.test.js"]
+    assert index.affected_tests({"tests/plain.test.js"}) == ["tests/plain.test.js"]
+    assert index.affected_tests({"README.md"}) == []
+
+def test_update_picks_up_new_imports_and_files(tmp_path):
+    index = make_index(tmp_path)
+    write(tmp_path, "tests/plain.test.js", "require('../src/format');\n")
+    assert index.update([tmp_path / "tests/plain.test.js"]) == ["tests/plain.test.js"]
+    assert index.affected_tests({"src/format.js"}) == [
+        "tests/cart.test.js", "tests/checkout.test.js", "tests/plain.test.js"
+    ]
+
+    new_test = write(tmp_path, "tests/new.test.js", "require('../src/cart');\n")
+    assert index.update([new_test]) == ["tests/new.test.js"]
+    assert "tests/new.test.js" in index.files
+
+def test_update_removes_deleted_files(tmp_path):
+    index = make_index(tmp_path)
+    files = index.files
+    (tmp_path / "tests/cart.test.js").unlink()
+    assert index.update([tmp_path / "tests/cart.test.js"]) == []
+    assert "tests/cart.test.js" not in index.files
+    assert "tests/cart.test.js" not in index.dependencies
+    # The previous mapping is replaced, not mutated
+    assert "tests/cart.test.js" in files
+
+def test_update_ignores_excluded_and_outside_paths(tmp_path):
+    index = make_index(tmp_path)
+    before = index.files
+    assert index.update([tmp_path / "node_modules/lib/index.js", tmp_path.parent / "elsewhere.js"]) == []
+    assert index.files == before
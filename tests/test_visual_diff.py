@@ -0,0 +1,92 @@
+import numpy as np
+from PIL import Image
+
+from visual_diff import compare_image, compare_screenshots
+
+def white(height=1080, width=1920):
+    return np.full((height, width, 3), 255, dtype=np.uint8)
+
+def save(pixels, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+def compare(tmp_path, current, baseline, **kwargs):
+    return compare_image(
+        save(current, tmp_path / "current.png"), save(baseline, tmp_path / "baseline.png"),
+        str(tmp_path / "diff.png"), str(tmp_path / "cache"), **kwargs
+    )
+
+def test_identical_images_skip_every_tile(tmp_path):
+    page = white()
+    page[100:200, 100:300] = (30, 60, 90)
+    result = compare(tmp_path, page, page.copy())
+    assert result['passed']
+    assert result['changed_tiles'] == 0
+    assert result['heatmap'] is None
+
+def test_two_pixel_bar_is_a_difference(tmp_path):
+    page = white()
+    page[500:502, 60:1860] = 0
+    result = compare(tmp_path, page, white())
+    assert not result['passed']
+    assert result['diff_pixels'] == 2 * 1800
+    assert (tmp_path / "diff.png").exists()
+
+def test_removed_one_pixel_line_is_a_difference(tmp_path):
+    baseline = white()
+    baseline[300, 60:1860] = 0
+    baseline[100:400, 960] = 0
+    result = compare(tmp_path, white(), baseline)
+    assert not result['passed']
+    assert result['diff_pixels'] == 1800 + 300 - 1
+
+def test_one_pixel_border_colour_change_is_a_difference(tmp_path):
+    baseline = white(200, 200)
+    baseline[50:150, 50:150] = (200, 200, 200)
+    baseline[50, 50:150] = baseline[149, 50:150] = 0
+    baseline[50:150, 50] = baseline[50:150, 149] = 0
+    current = baseline.copy()
+    current[50, 50:150] = (220, 0, 0)
+    result = compare(tmp_path, current, baseline)
+    assert not result['passed']
+    # Corner pixels sit between darker and brighter flat areas and read as anti-aliasing
+    assert 90 < result['diff_pixels'] <= 100
+
+def test_anti_aliased_edge_is_tolerated(tmp_path):
+    baseline = white(200, 200)
+    baseline[40:160, 40:100] = 0
+    # The same block rendered with a grey anti-aliasing column on its right edge
+    current = baseline.copy()
+    current[40:160, 100] = 128
+    result = compare(tmp_path, current, baseline)
+    assert result['passed']
+    assert result['changed_tiles'] > 0
+    assert result['diff_pixels'] == 0
+
+def test_stale_decode_cache_entries_are_pruned(tmp_path):
+    screenshots, baselines, output = tmp_path / "shots", tmp_path / "base", tmp_path / "out"
+    page = white(256, 256)
+    save(page, baselines / "home.png")
+
+    for shade in (10, 20, 30):
+        changed = page.copy()
+        changed[100:110, 100:200] = shade
+        save(changed, screenshots / "home.png")
+        [result] = compare_screenshots(str(screenshots), str(baselines), str(output))
+        assert not result['passed']
+
+    # Only the current screenshot and the baseline remain: image + tile hashes each
+    cached = sorted(path.name.split(".", 1)[0] for path in (output / ".cache").iterdir())
+    assert len(cached) == 4
+    assert len(set(cached)) == 2
+
+def test_stale_heatmap_is_removed_once_the_diff_is_gone(tmp_path):
+    page = white()
+    page[500:502, 60:1860] = 0
+    compare(tmp_path, page, white())
+    assert (tmp_path / "diff.png").exists()
+
+    result = compare(tmp_path, white(), white())
+    assert result['heatmap'] is None
+    assert not (tmp_path / "diff.png").exists()
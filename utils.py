@@ -126,3 +126,185 @@ def parse_test_commands(test_files: list[Path]) -> list[dict]:
             continue
     
     return commands
+
+TEST_FILE_SUFFIXES = ('.js', '.jsx', '.ts', '.tsx')
+IMPORT_PATTERN = re.compile(
+    r"""(?:require\s*\(\s*|import\s*\(\s*|from\s+|import\s+)['"]([^'"]+)['"]"""
+)
+
+def is_test_file(path: Path) -> bool:
+    """Check whether a path matches the patterns used by scan_test_files"""
+    if path.suffix not in TEST_FILE_SUFFIXES:
+        return False
+    return path.stem.endswith('.test') or '__tests__' in path.parts[:-1]
+
+def parse_imports(content: str) -> list[str]:
+    """
+    Extract relative module specifiers from require/import statements
+
+    Args:
+        content: JavaScript or TypeScript source
+
+    Returns:
+        list: Specifiers starting with './' or '../'
+    """
+    return [spec for spec in IMPORT_PATTERN.findall(content) if spec.startswith(('./', '../'))]
+
+def resolve_import(source: Path, specifier: str) -> Path | None:
+    """Resolve a relative specifier the way Node does for files and directory indexes"""
+    base = (source.parent / specifier)
+    candidates = [base] + [base.with_name(base.name + ext) for ext in TEST_FILE_SUFFIXES]
+    candidates += [base / f"index{ext}" for ext in TEST_FILE_SUFFIXES]
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    return None
+
+class TestIndex:
+    """Discovery index of test files keyed by file ID (path relative to the project directory)"""
+
+    def __init__(self, directory: str, exclude_patterns: list[str] = None):
+        # Absolute, so scanned paths and relative file IDs share one anchor
+        self.directory = Path(directory).resolve()
+        self.exclude_patterns = exclude_patterns
+        self.files: dict[str, Path] = {}
+        self.dependencies: dict[str, set[str]] = {}
+
+    def scan(self) -> list[Path]:
+        """Rebuild the index from a full directory scan"""
+        test_files = scan_test_files(str(self.directory), self.exclude_patterns)
+        files = {self.file_id(path): path for path in test_files}
+        dependencies = {}
+        for file_id in files:
+            self._index_dependencies(file_id, dependencies=dependencies)
+        self.files, self.dependencies = files, dependencies
+        return test_files
+
+    def is_excluded(self, path: Path) -> bool:
+        """Check a path against the index's exclude patterns"""
+        exclude_patterns = self.exclude_patterns if self.exclude_patterns is not None else ['node_modules']
+        return any(excl in str(path) for excl in exclude_patterns)
+
+    def _index_dependencies(self, file_id: str, force: bool = False, dependencies: dict = None):
+        """Record the relative imports of a file and, transitively, of what it imports"""
+        if dependencies is None:
+            dependencies = self.dependencies
+        pending = [file_id]
+        while pending:
+            current = pending.pop()
+            if current in dependencies and not force:
+                continue
+            force = False
+            path = self.directory / current
+            try:
+                content = path.read_text()
+            except (OSError, UnicodeDecodeError):
+                dependencies[current] = set()
+                continue
+            deps = set()
+            for specifier in parse_imports(content):
+                resolved = resolve_import(path, specifier)
+                if resolved is None or self.is_excluded(resolved):
+                    continue
+                dep_id = self.file_id(resolved)
+                if dep_id is not None:
+                    deps.add(dep_id)
+                    pending.append(dep_id)
+            dependencies[current] = deps
+
+    def dependency_closure(self, file_id: str, dependencies: dict = None) -> set[str]:
+        """Return every project file a test file imports, directly or indirectly"""
+        if dependencies is None:
+            dependencies = self.dependencies
+        seen, pending = set(), [file_id]
+        while pending:
+            for dep in dependencies.get(pending.pop(), ()):
+                if dep not in seen:
+                    seen.add(dep)
+                    pending.append(dep)
+        return seen
+
+    def modules_for(self, path) -> list[str]:
+        """Return the IDs of a file and every project module it imports, indexing them if needed"""
+        file_id = self.file_id(path)
+        if file_id is None:
+            return []
+        self._index_dependencies(file_id)
+        return [file_id] + sorted(self.dependency_closure(file_id) - {file_id})
+
+    def affected_tests(self, changed_ids: set[str]) -> list[str]:
+        """Return the indexed test files that are, or depend on, any changed file"""
+        files, dependencies = self.files, self.dependencies
+        return sorted(
+            file_id for file_id in files
+            if file_id in changed_ids or self.dependency_closure(file_id, dependencies) & changed_ids
+        )
+
+    def update(self, paths) -> list[str]:
+        """
+        Apply filesystem changes incrementally
+
+        The changes are applied to copies that then replace files and
+        dependencies, so other threads iterating the index (e.g. the UI
+        while a watcher updates it) never see a dict change size.
+
+        Args:
+            paths: Created, modified or deleted paths
+
+        Returns:
+            list: IDs of test files affected by the changes
+        """
+        files, dependencies = dict(self.files), dict(self.dependencies)
+        changed_ids = set()
+        for path in paths:
+            path = Path(path)
+            file_id = self.file_id(path)
+            if file_id is None or self.is_excluded(path):
+                continue
+            changed_ids.add(file_id)
+
+            if not path.exists():
+                files.pop(file_id, None)
+                dependencies.pop(file_id, None)
+                continue
+            if is_test_file(path):
+                files[file_id] = self.directory / file_id
+            if file_id in dependencies or file_id in files:
+                self._index_dependencies(file_id, force=True, dependencies=dependencies)
+        self.files, self.dependencies = files, dependencies
+        return self.affected_tests(changed_ids)
+
+    def file_id(self, path) -> str | None:
+        """Return the project-relative ID of a path, or None if it lies outside the project"""
+        path = Path(path)
+        if not path.is_absolute():
+            path = self.directory / path
+        try:
+            return path.resolve().relative_to(self.directory.resolve()).as_posix()
+        except ValueError:
+            return None
+
+    def resolve(self, entry: str) -> str | None:
+        """
+        Resolve a stored file path to an indexed file ID
+
+        Paths recorded on another machine or checkout are matched by their
+        longest indexed suffix. A suffix shared by several indexed files is
+        ambiguous and left unresolved rather than bound to the wrong file.
+        """
+        file_id = self.file_id(entry)
+        if file_id in self.files:
+            return file_id
+
+        parts = Path(entry).parts
+        for start in range(len(parts)):
+            suffix = Path(*parts[start:]).as_posix()
+            matches = [
+                candidate for candidate in self.files
+                if candidate == suffix or candidate.endswith('/' + suffix)
+            ]
+            if len(matches) == 1:
+                return matches[0]
+            if matches:
+                return None
+        return None
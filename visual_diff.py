@@ -0,0 +1,372 @@
+"""
+Visual regression checks for Puppeteer screenshots
+
+Screenshots are compared with baselines of the same relative path. Decoded
+images are cached as .npy files keyed by the sha256 of the PNG and opened
+memory-mapped, so large full-page captures are only paged in where needed.
+Both images are split into tiles; tiles whose hashes match are skipped, and
+the remaining tiles are compared in one vectorized pass using a YIQ colour
+distance. Pixels over the threshold are ignored only when they look like
+anti-aliasing, using the pixelmatch heuristic: the pixel sits between a
+darker and a brighter neighbour, and one of those lies in a flat region in
+both images. Thin lines and text edges therefore still count. Images are
+processed in a process pool, and decode cache entries for images that are
+no longer current are removed after each comparison.
+"""
+import hashlib
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# Maximum possible YIQ delta between two RGB pixels
+MAX_YIQ_DELTA = 35215.0
+
+# Number of changed tiles compared per vectorized batch
+TILE_BATCH = 256
+
+# Locations relative to the Jest project directory
+SCREENSHOT_DIR = 'report/screenshots'
+BASELINE_DIR = 'report/baselines'
+DIFF_DIR = 'report/visual-diffs'
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+def load_image_array(path: Path, digest: str, cache_dir: Path) -> np.ndarray:
+    """Return an RGB uint8 array for a PNG, memory-mapped from the decode cache"""
+    cache_path = Path(cache_dir) / f"{digest}.npy"
+    if not cache_path.exists():
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(path) as image:
+            pixels = np.asarray(image.convert("RGB"))
+        tmp_path = cache_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, pixels)
+        tmp_path.replace(cache_path)
+    return np.load(cache_path, mmap_mode="r")
+
+def tile_hashes(pixels: np.ndarray, tile: int) -> np.ndarray:
+    """Return a (rows, cols) array of 64-bit hashes, one per tile"""
+    rows, cols = -(-pixels.shape[0] // tile), -(-pixels.shape[1] // tile)
+    hashes = np.empty((rows, cols), dtype=np.uint64)
+    for r in range(rows):
+        band = np.ascontiguousarray(pixels[r * tile:(r + 1) * tile])
+        for c in range(cols):
+            digest = hashlib.blake2b(band[:, c * tile:(c + 1) * tile].tobytes(), digest_size=8)
+            hashes[r, c] = int.from_bytes(digest.digest(), "little")
+    return hashes
+
+def cached_tile_hashes(digest: str, pixels: np.ndarray, tile: int, cache_dir: Path) -> np.ndarray:
+    cache_path = Path(cache_dir) / f"{digest}.tiles{tile}.npy"
+    if cache_path.exists():
+        return np.load(cache_path)
+    hashes = tile_hashes(pixels, tile)
+    np.save(cache_path, hashes)
+    return hashes
+
+def yiq(pixels: np.ndarray) -> np.ndarray:
+    """Convert RGB pixels (last axis) to float32 YIQ"""
+    rgb = pixels.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return np.stack([
+        0.29889531 * r + 0.58662247 * g + 0.11448223 * b,
+        0.59597799 * r - 0.27417610 * g - 0.32180189 * b,
+        0.21147017 * r - 0.52261711 * g + 0.31114694 * b,
+    ], axis=-1)
+
+def yiq_delta(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    d = a - b
+    return 0.5053 * d[..., 0] ** 2 + 0.299 * d[..., 1] ** 2 + 0.1957 * d[..., 2] ** 2
+
+# Border around each tile: anti-aliasing checks look at neighbours of neighbours
+TILE_PAD = 2
+
+# Neighbour offsets in pixelmatch's scan order (x outer, y inner)
+NEIGHBOURS = [(dy, dx) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dy, dx) != (0, 0)]
+
+def extract_tiles(pixels: np.ndarray, coords: np.ndarray, tile: int,
+                  pad: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stack tiles plus a border into arrays
+
+    Returns:
+        tuple: (N, S, S, 3) pixels, edge-padded to full size, and an (N, S, S)
+            mask of which of them lie inside the image, where S = tile + 2 * pad
+    """
+    height, width = pixels.shape[:2]
+    size = tile + 2 * pad
+    out = np.empty((len(coords), size, size, 3), dtype=pixels.dtype)
+    inside = np.empty((len(coords), size, size), dtype=bool)
+    for i, (r, c) in enumerate(coords):
+        ys = np.arange(r * tile - pad, r * tile - pad + size)
+        xs = np.arange(c * tile - pad, c * tile - pad + size)
+        out[i] = pixels[np.clip(ys, 0, height - 1)[:, None], np.clip(xs, 0, width - 1)[None, :]]
+        inside[i] = ((ys >= 0) & (ys < height))[:, None] & ((xs >= 0) & (xs < width))[None, :]
+    return out, inside
+
+def shifted(array: np.ndarray, dy: int, dx: int, margin: int) -> np.ndarray:
+    """View of array (N, S, S, ...) offset by (dy, dx), cropped by margin on every side"""
+    size = array.shape[1]
+    return array[:, margin + dy:size - margin + dy, margin + dx:size - margin + dx]
+
+def many_siblings(packed: np.ndarray, inside: np.ndarray) -> np.ndarray:
+    """
+    pixelmatch hasManySiblings for every pixel one in from the border
+
+    A pixel has many siblings when more than two of its neighbours are
+    identical to it; pixels on the image edge start with one.
+    """
+    center = shifted(packed, 0, 0, 1)
+    count = np.zeros(center.shape, dtype=np.int8)
+    on_edge = np.zeros(center.shape, dtype=bool)
+    for dy, dx in NEIGHBOURS:
+        neighbour_inside = shifted(inside, dy, dx, 1)
+        on_edge |= ~neighbour_inside
+        count += neighbour_inside & (shifted(packed, dy, dx, 1) == center)
+    return (count + on_edge) > 2
+
+def antialiased(luma: np.ndarray, inside: np.ndarray, siblings: np.ndarray,
+                other_siblings: np.ndarray) -> np.ndarray:
+    """
+    pixelmatch antialiased() for every tile pixel of one image
+
+    Args:
+        luma: (N, S, S) brightness of the image
+        inside: (N, S, S) mask of pixels inside the image
+        siblings, other_siblings: many_siblings() of this and the other image
+
+    Returns:
+        np.ndarray: (N, T, T) mask of pixels that look anti-aliased
+    """
+    pad = TILE_PAD
+    center = shifted(luma, 0, 0, pad)
+    deltas = np.stack([center - shifted(luma, dy, dx, pad) for dy, dx in NEIGHBOURS], axis=1)
+    valid = np.stack([shifted(inside, dy, dx, pad) for dy, dx in NEIGHBOURS], axis=1)
+
+    on_edge = ~valid.all(axis=1)
+    zeroes = on_edge + (valid & (deltas == 0)).sum(axis=1)
+    # The brightest and the darkest neighbour (first in scan order on ties)
+    brighter = np.where(valid & (deltas < 0), deltas, 0)
+    darker = np.where(valid & (deltas > 0), deltas, 0)
+    min_idx = brighter.argmin(axis=1)[:, None]
+    max_idx = darker.argmax(axis=1)[:, None]
+    has_range = (np.take_along_axis(brighter, min_idx, 1)[:, 0] < 0) & \
+                (np.take_along_axis(darker, max_idx, 1)[:, 0] > 0)
+
+    # Sibling masks cover the tile plus one pixel, so neighbours sit at margin pad - 1
+    both = siblings & other_siblings
+    flat = np.stack([shifted(both, dy, dx, pad - 1) for dy, dx in NEIGHBOURS], axis=1)
+    flat_extreme = (np.take_along_axis(flat, min_idx, 1)[:, 0] |
+                    np.take_along_axis(flat, max_idx, 1)[:, 0])
+    return (zeroes <= 2) & has_range & flat_extreme
+
+def tile_diff(current: np.ndarray, baseline: np.ndarray, inside: np.ndarray,
+              threshold: float) -> np.ndarray:
+    """
+    Per-pixel diff for a batch of padded tiles
+
+    Args:
+        current, baseline: (N, T+4, T+4, 3) uint8 tiles with a TILE_PAD border
+        inside: (N, T+4, T+4) mask of pixels inside the image
+        threshold: Colour distance tolerance in [0, 1]
+
+    Returns:
+        np.ndarray: (N, T, T) float32 delta normalised to [0, 1], zero where tolerated
+    """
+    limit = MAX_YIQ_DELTA * threshold * threshold
+    cur, base = yiq(current), yiq(baseline)
+    center = (slice(None), slice(TILE_PAD, -TILE_PAD), slice(TILE_PAD, -TILE_PAD))
+    direct = yiq_delta(cur[center], base[center])
+    differs = direct > limit
+
+    if differs.any():
+        def pack(pixels):
+            rgb = pixels.astype(np.int32)
+            return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+        cur_siblings = many_siblings(pack(current), inside)
+        base_siblings = many_siblings(pack(baseline), inside)
+        tolerated = (
+            antialiased(cur[..., 0], inside, cur_siblings, base_siblings)
+            | antialiased(base[..., 0], inside, base_siblings, cur_siblings)
+        )
+        differs &= ~tolerated
+    return np.where(differs, direct / MAX_YIQ_DELTA, 0.0).astype(np.float32)
+
+def render_heatmap(current: np.ndarray, delta: np.ndarray, path: Path):
+    """Write a dimmed greyscale copy of the screenshot with differences in red"""
+    grey = (yiq(np.asarray(current))[..., 0] * 0.3).astype(np.uint8)
+    heatmap = np.stack([grey, grey, grey], axis=-1)
+    mask = delta > 0
+    intensity = np.clip(128 + delta * 127 * 4, 128, 255).astype(np.uint8)
+    heatmap[mask] = np.stack([intensity[mask], np.zeros_like(intensity[mask]),
+                              np.zeros_like(intensity[mask])], axis=-1)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(heatmap).save(path, optimize=True)
+
+def compare_image(screenshot: str, baseline: str, heatmap_path: str, cache_dir: str,
+                  threshold: float = 0.1, max_diff_ratio: float = 0.0, tile: int = 64,
+                  digests: Optional[tuple[str, str]] = None) -> dict:
+    """
+    Compare one screenshot with its baseline
+
+    Args:
+        digests: sha256 of the screenshot and baseline, if already known
+
+    Returns:
+        dict: Result with pass/fail, diff ratio, tile counts and heatmap path
+    """
+    start = time.time()
+    cache_dir = Path(cache_dir)
+    current_digest, baseline_digest = digests or (file_digest(screenshot), file_digest(baseline))
+    current = load_image_array(Path(screenshot), current_digest, cache_dir)
+    reference = load_image_array(Path(baseline), baseline_digest, cache_dir)
+    result = {
+        'image': screenshot,
+        'baseline': baseline,
+        'heatmap': None,
+        'diff_pixels': 0,
+        'diff_ratio': 0.0,
+        'changed_tiles': 0,
+        'total_tiles': 0,
+    }
+
+    if current.shape != reference.shape:
+        # A heatmap left over from an earlier run would describe a different diff
+        Path(heatmap_path).unlink(missing_ok=True)
+        result.update(passed=False, diff_ratio=1.0, duration=round(time.time() - start, 2),
+                      reason=f"size changed from {reference.shape[1]}x{reference.shape[0]} "
+                             f"to {current.shape[1]}x{current.shape[0]}")
+        return result
+
+    current_hashes = cached_tile_hashes(current_digest, current, tile, cache_dir)
+    baseline_hashes = cached_tile_hashes(baseline_digest, reference, tile, cache_dir)
+    changed = np.argwhere(current_hashes != baseline_hashes)
+    result['total_tiles'] = int(current_hashes.size)
+    result['changed_tiles'] = int(len(changed))
+
+    if len(changed):
+        height, width = current.shape[:2]
+        delta = np.zeros((height, width), dtype=np.float32)
+        # Bounded batches keep memory flat when a whole page changes
+        for start_idx in range(0, len(changed), TILE_BATCH):
+            batch = changed[start_idx:start_idx + TILE_BATCH]
+            current_tiles, inside = extract_tiles(current, batch, tile, TILE_PAD)
+            reference_tiles, _ = extract_tiles(reference, batch, tile, TILE_PAD)
+            deltas = tile_diff(current_tiles, reference_tiles, inside, threshold)
+            for (r, c), tile_delta in zip(batch, deltas):
+                y0, x0 = r * tile, c * tile
+                h, w = min(tile, height - y0), min(tile, width - x0)
+                delta[y0:y0 + h, x0:x0 + w] = tile_delta[:h, :w]
+
+        diff_pixels = int(np.count_nonzero(delta))
+        result['diff_pixels'] = diff_pixels
+        result['diff_ratio'] = diff_pixels / (height * width)
+        if diff_pixels:
+            render_heatmap(current, delta, Path(heatmap_path))
+            result['heatmap'] = heatmap_path
+    if result['heatmap'] is None:
+        Path(heatmap_path).unlink(missing_ok=True)
+
+    result['passed'] = result['diff_ratio'] <= max_diff_ratio
+    result['reason'] = (
+        f"{result['diff_pixels']} px differ ({result['diff_ratio']:.4%}) "
+        f"in {result['changed_tiles']}/{result['total_tiles']} changed tiles"
+    )
+    result['duration'] = round(time.time() - start, 2)
+    return result
+
+def prune_cache(cache_dir: Path, keep: set[str]) -> int:
+    """
+    Delete decode cache entries whose digest is not in keep
+
+    Returns:
+        int: Bytes freed
+    """
+    freed = 0
+    try:
+        entries = list(Path(cache_dir).iterdir())
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.name.split(".", 1)[0] in keep:
+            continue
+        try:
+            freed += entry.stat().st_size
+            entry.unlink()
+        except OSError:
+            continue
+    return freed
+
+def compare_screenshots(screenshot_dir: str, baseline_dir: str, output_dir: str,
+                        threshold: float = 0.1, max_diff_ratio: float = 0.0, tile: int = 64,
+                        max_workers: Optional[int] = None, update_baselines: bool = False) -> list[dict]:
+    """
+    Compare every PNG under screenshot_dir with its baseline
+
+    Screenshots without a baseline are copied into baseline_dir and pass.
+    With update_baselines, every screenshot replaces its baseline. Decode
+    cache entries for images other than the compared pairs are removed.
+
+    Returns:
+        list: One result dict per screenshot
+    """
+    screenshot_dir, baseline_dir, output_dir = Path(screenshot_dir), Path(baseline_dir), Path(output_dir)
+    cache_dir = output_dir / ".cache"
+    results, jobs, live_digests = [], [], set()
+
+    for screenshot in sorted(screenshot_dir.glob("**/*.png")):
+        relative = screenshot.relative_to(screenshot_dir)
+        baseline = baseline_dir / relative
+        heatmap = output_dir / relative.with_name(f"{relative.stem}-diff.png")
+        if update_baselines or not baseline.exists():
+            baseline.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(screenshot, baseline)
+            heatmap.unlink(missing_ok=True)
+            results.append({
+                'image': str(screenshot), 'baseline': str(baseline), 'heatmap': None,
+                'passed': True, 'diff_pixels': 0, 'diff_ratio': 0.0, 'changed_tiles': 0,
+                'total_tiles': 0, 'duration': 0.0,
+                'reason': "baseline updated" if update_baselines else "new baseline recorded"
+            })
+            continue
+        digests = (file_digest(screenshot), file_digest(baseline))
+        live_digests.update(digests)
+        jobs.append((str(screenshot), str(baseline), str(heatmap), str(cache_dir),
+                     threshold, max_diff_ratio, tile, digests))
+
+    if len(jobs) == 1 or max_workers == 1:
+        results.extend(compare_image(*job) for job in jobs)
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(compare_image, *job) for job in jobs]
+            results.extend(future.result() for future in futures)
+
+    prune_cache(cache_dir, live_digests)
+    return sorted(results, key=lambda r: r['image'])
+
+def to_result_rows(diffs: list[dict]) -> list[dict]:
+    """Convert visual diff results into the runner's result row format"""
+    rows = []
+    for diff in diffs:
+        output = f"Screenshot: {diff['image']}\nBaseline: {diff['baseline']}\n{diff['reason']}\n"
+        if diff['heatmap']:
+            output += f"Heatmap: {diff['heatmap']}\n"
+        rows.append({
+            'Test': f"visual: {Path(diff['image']).name}",
+            'Status': '✅ PASS' if diff['passed'] else '❌ FAIL',
+            'Duration': f"{diff['duration']}s",
+            'Output': output
+        })
+    return rows
+
+def compare_project(project_dir: str, **kwargs) -> list[dict]:
+    """Compare a Jest project's screenshots with its baselines using the standard layout"""
+    project = Path(project_dir)
+    return compare_screenshots(
+        str(project / SCREENSHOT_DIR), str(project / BASELINE_DIR), str(project / DIFF_DIR), **kwargs
+    )
@@ -0,0 +1,167 @@
+"""
+Watch a Jest project and report which tests are affected by file changes
+
+Changes are received from watchdog (inotify on Linux) when it is installed,
+or from a polling scanner otherwise. Bursts of events are coalesced until
+the tree has been quiet for the debounce period, the TestIndex is updated
+incrementally and the callback receives the affected test file paths.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from utils import TestIndex
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+WATCHED_SUFFIXES = ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs', '.json')
+CHANGE_EVENTS = {'created', 'modified', 'deleted', 'moved'}
+
+class _EventForwarder(FileSystemEventHandler):
+    def __init__(self, watcher: "TestWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        # Ignore opened/closed events: reading files to re-index them would loop
+        if event.is_directory or event.event_type not in CHANGE_EVENTS:
+            return
+        self.watcher.notify(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+class TestWatcher:
+    def __init__(self, index: TestIndex, on_change: Callable[[list[Path]], None],
+                 debounce: float = 0.2, poll_interval: float = 1.0, use_polling: bool = False,
+                 idle_timeout: Optional[float] = None):
+        """
+        Args:
+            index: Scanned TestIndex of the project to watch
+            on_change: Called with the affected test paths after each burst of changes
+            debounce: Seconds without new events before a burst is processed
+            poll_interval: Seconds between scans when polling
+            use_polling: Poll even if watchdog is available
+            idle_timeout: Stop on its own when touch() has not been called for
+                this many seconds, so watchers owned by ended sessions exit
+        """
+        self.index = index
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_polling = use_polling or Observer is None
+        self.idle_timeout = idle_timeout
+
+        self._changed: set[str] = set()
+        self._last_event = 0.0
+        self._last_touch = time.monotonic()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._observer = None
+
+    @property
+    def backend(self) -> str:
+        return "polling" if self.use_polling else "watchdog"
+
+    def touch(self):
+        """Signal that the owner is still alive (see idle_timeout)"""
+        self._last_touch = time.monotonic()
+
+    def _idle(self) -> bool:
+        return self.idle_timeout is not None and time.monotonic() - self._last_touch > self.idle_timeout
+
+    def notify(self, path: str):
+        """Record a changed path; processed once events stop for the debounce period"""
+        if not path.endswith(WATCHED_SUFFIXES) or self.index.is_excluded(Path(path)):
+            return
+        with self._condition:
+            self._changed.add(path)
+            self._last_event = time.monotonic()
+            self._condition.notify()
+
+    def _debounce_loop(self):
+        idle = False
+        while not self._stop.is_set():
+            with self._condition:
+                while not self._changed and not self._stop.is_set() and not self._idle():
+                    self._condition.wait(self.idle_timeout)
+                idle = self._idle()
+                if self._stop.is_set() or idle:
+                    break
+                quiet_for = time.monotonic() - self._last_event
+                if quiet_for < self.debounce:
+                    self._condition.wait(self.debounce - quiet_for)
+                    continue
+                changed, self._changed = self._changed, set()
+
+            affected = self.index.update(changed)
+            if affected:
+                self.on_change([self.index.files[file_id] for file_id in affected])
+
+        if idle:
+            # The owner stopped calling touch(); release the observer and poller
+            self._shutdown()
+
+    def _snapshot(self) -> dict[str, int]:
+        snapshot = {}
+        for root, dirs, files in os.walk(self.index.directory):
+            dirs[:] = [d for d in dirs if not self.index.is_excluded(Path(root) / d)]
+            for name in files:
+                if name.endswith(WATCHED_SUFFIXES):
+                    path = os.path.join(root, name)
+                    try:
+                        snapshot[path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        continue
+        return snapshot
+
+    def _poll_loop(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self.notify(path)
+            previous = current
+
+    def start(self):
+        """Start watching in background threads"""
+        self._stop.clear()
+        if self.use_polling:
+            targets = [self._debounce_loop, self._poll_loop]
+        else:
+            self._observer = Observer()
+            self._observer.schedule(_EventForwarder(self), str(self.index.directory), recursive=True)
+            self._observer.start()
+            targets = [self._debounce_loop]
+        self._threads = [threading.Thread(target=target, daemon=True) for target in targets]
+        for thread in self._threads:
+            thread.start()
+
+    def _shutdown(self):
+        """Signal every thread to exit and stop the observer, without joining"""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+    def stop(self):
+        self._shutdown()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)